@@ -0,0 +1,104 @@
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = '8c1f0d3a92b4'
+down_revision = '57a48c210abc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'activity_type_closure',
+        sa.Column('ancestor_id', sa.Integer(),
+                  sa.ForeignKey('activity_types.activity_type_id', ondelete='CASCADE'),
+                  primary_key=True, nullable=False),
+        sa.Column('descendant_id', sa.Integer(),
+                  sa.ForeignKey('activity_types.activity_type_id', ondelete='CASCADE'),
+                  primary_key=True, nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        'ix_activity_type_closure_descendant_depth',
+        'activity_type_closure',
+        ['descendant_id', 'depth'],
+        postgresql_include=['ancestor_id'],
+    )
+
+    # заполняем замыкание для уже существующих деятельностей
+    op.execute("""
+        WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS (
+            SELECT activity_type_id, activity_type_id, 0
+            FROM activity_types
+            UNION ALL
+            SELECT closure.ancestor_id, child.activity_type_id, closure.depth + 1
+            FROM closure
+            JOIN activity_types AS child ON child.parent_id = closure.descendant_id
+        )
+        INSERT INTO activity_type_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM closure
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION activity_type_closure_maintain() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO activity_type_closure (ancestor_id, descendant_id, depth)
+                VALUES (NEW.activity_type_id, NEW.activity_type_id, 0);
+
+                IF NEW.parent_id IS NOT NULL THEN
+                    INSERT INTO activity_type_closure (ancestor_id, descendant_id, depth)
+                    SELECT ancestor_id, NEW.activity_type_id, depth + 1
+                    FROM activity_type_closure
+                    WHERE descendant_id = NEW.parent_id;
+                END IF;
+                RETURN NEW;
+            END IF;
+
+            -- перенос поддерева под нового родителя
+            IF NEW.parent_id IS NOT NULL AND EXISTS (
+                SELECT 1 FROM activity_type_closure
+                WHERE ancestor_id = NEW.activity_type_id AND descendant_id = NEW.parent_id
+            ) THEN
+                RAISE EXCEPTION 'Activity type % cannot be moved under its own descendant %',
+                    NEW.activity_type_id, NEW.parent_id;
+            END IF;
+
+            DELETE FROM activity_type_closure AS link
+            USING activity_type_closure AS sub
+            WHERE sub.ancestor_id = NEW.activity_type_id
+              AND link.descendant_id = sub.descendant_id
+              AND link.ancestor_id NOT IN (
+                  SELECT descendant_id FROM activity_type_closure WHERE ancestor_id = NEW.activity_type_id
+              );
+
+            IF NEW.parent_id IS NOT NULL THEN
+                INSERT INTO activity_type_closure (ancestor_id, descendant_id, depth)
+                SELECT super.ancestor_id, sub.descendant_id, super.depth + sub.depth + 1
+                FROM activity_type_closure AS super
+                JOIN activity_type_closure AS sub ON sub.ancestor_id = NEW.activity_type_id
+                WHERE super.descendant_id = NEW.parent_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER activity_types_closure_insert
+        AFTER INSERT ON activity_types
+        FOR EACH ROW EXECUTE FUNCTION activity_type_closure_maintain()
+    """)
+    op.execute("""
+        CREATE TRIGGER activity_types_closure_move
+        AFTER UPDATE OF parent_id ON activity_types
+        FOR EACH ROW WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+        EXECUTE FUNCTION activity_type_closure_maintain()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS activity_types_closure_move ON activity_types")
+    op.execute("DROP TRIGGER IF EXISTS activity_types_closure_insert ON activity_types")
+    op.execute("DROP FUNCTION IF EXISTS activity_type_closure_maintain()")
+    op.drop_index('ix_activity_type_closure_descendant_depth', table_name='activity_type_closure')
+    op.drop_table('activity_type_closure')
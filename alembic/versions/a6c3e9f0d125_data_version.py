@@ -0,0 +1,41 @@
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = 'a6c3e9f0d125'
+down_revision = 'f3b8d1a6c472'
+branch_labels = None
+depends_on = None
+
+TABLES = ('organizations', 'buildings', 'phones', 'activity_types', 'organization_activity')
+
+
+def upgrade():
+    op.create_table(
+        'data_version',
+        sa.Column('data_version_id', sa.Integer(), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.execute("INSERT INTO data_version (data_version_id, version) VALUES (1, 0)")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION data_version_bump() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_version SET version = version + 1 WHERE data_version_id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # по одному увеличению на оператор, а не на каждую строку
+    for table in TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_data_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION data_version_bump()
+        """)
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_data_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS data_version_bump()")
+    op.drop_table('data_version')
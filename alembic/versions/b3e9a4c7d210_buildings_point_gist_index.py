@@ -0,0 +1,15 @@
+from alembic import op
+
+revision: str = 'b3e9a4c7d210'
+down_revision = '8c1f0d3a92b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GiST по point(longitude, latitude): BBOX-фильтр `<@ box(...)` идёт индексом, PostGIS не нужен
+    op.execute("CREATE INDEX ix_buildings_point ON buildings USING gist (point(longitude, latitude))")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_buildings_point")
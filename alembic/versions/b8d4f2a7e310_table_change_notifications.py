@@ -0,0 +1,93 @@
+from alembic import op
+
+revision: str = 'b8d4f2a7e310'
+down_revision = 'a6c3e9f0d125'
+branch_labels = None
+depends_on = None
+
+# таблица -> колонка первичного ключа, который уходит в уведомление (None — ключ составной)
+TABLES = {
+    'organizations': 'organization_id',
+    'buildings': 'building_id',
+    'phones': 'phone_id',
+    'activity_types': 'activity_type_id',
+    'organization_activity': None,
+}
+
+
+def upgrade():
+    # уведомления по ключам строк; при массовых изменениях — одно уведомление без ключа (сброс всей таблицы)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+        DECLARE
+            changed_keys integer[];
+            changed_key integer;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' OR TG_NARGS = 0 THEN
+                PERFORM pg_notify('table_changes', json_build_object('table', TG_TABLE_NAME, 'key', NULL)::text);
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP = 'DELETE' THEN
+                EXECUTE format('SELECT array_agg(DISTINCT %I) FROM old_rows', TG_ARGV[0]) INTO changed_keys;
+            ELSE
+                EXECUTE format('SELECT array_agg(DISTINCT %I) FROM new_rows', TG_ARGV[0]) INTO changed_keys;
+            END IF;
+
+            IF changed_keys IS NULL THEN
+                RETURN NULL;
+            END IF;
+
+            IF cardinality(changed_keys) > 100 THEN
+                PERFORM pg_notify('table_changes', json_build_object('table', TG_TABLE_NAME, 'key', NULL)::text);
+            ELSE
+                FOREACH changed_key IN ARRAY changed_keys LOOP
+                    PERFORM pg_notify(
+                        'table_changes', json_build_object('table', TG_TABLE_NAME, 'key', changed_key)::text
+                    );
+                END LOOP;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # переходные таблицы допускаются только у триггера на одно событие, поэтому триггеров по одному на событие
+    for table, key_column in TABLES.items():
+        if key_column is None:
+            op.execute(f"""
+                CREATE TRIGGER {table}_notify
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+            """)
+            continue
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_insert
+            AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change('{key_column}')
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_update
+            AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change('{key_column}')
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_delete
+            AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change('{key_column}')
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_truncate
+            AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+        """)
+
+
+def downgrade():
+    for table, key_column in TABLES.items():
+        if key_column is None:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_notify ON {table}")
+            continue
+        for event in ('insert', 'update', 'delete', 'truncate'):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_{event} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_table_change()")
@@ -0,0 +1,48 @@
+from alembic import op
+
+revision: str = 'c5e1a8d3f604'
+down_revision = 'b8d4f2a7e310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # организации здания (списки, гео-запросы, триггеры на buildings): index-only scan сразу в порядке id
+    op.create_index('ix_organizations_building_id', 'organizations', ['building_id', 'organization_id'])
+
+    # телефоны организации для json_agg(... ORDER BY phone_id) в проекции и каскадного удаления
+    op.create_index(
+        'ix_phones_organization_id',
+        'phones',
+        ['organization_id', 'phone_id'],
+        postgresql_include=['number'],
+    )
+
+    # обратный проход: организации по деятельностям поддерева (первичный ключ начинается с organization_id)
+    op.create_index(
+        'ix_organization_activity_activity_type_id',
+        'organization_activity',
+        ['activity_type_id', 'organization_id'],
+    )
+
+    # дочерние деятельности и ON DELETE SET NULL по parent_id
+    op.create_index('ix_activity_types_parent_id', 'activity_types', ['parent_id'])
+
+    # поддерево до заданной глубины: ancestor_id = ... AND depth <= ... без чтения таблицы
+    op.create_index(
+        'ix_activity_type_closure_ancestor_depth',
+        'activity_type_closure',
+        ['ancestor_id', 'depth'],
+        postgresql_include=['descendant_id'],
+    )
+
+    for table in ('organizations', 'phones', 'organization_activity', 'activity_types', 'activity_type_closure'):
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade():
+    op.drop_index('ix_activity_type_closure_ancestor_depth', table_name='activity_type_closure')
+    op.drop_index('ix_activity_types_parent_id', table_name='activity_types')
+    op.drop_index('ix_organization_activity_activity_type_id', table_name='organization_activity')
+    op.drop_index('ix_phones_organization_id', table_name='phones')
+    op.drop_index('ix_organizations_building_id', table_name='organizations')
@@ -0,0 +1,16 @@
+from alembic import op
+
+revision: str = 'd41f6e2b8a93'
+down_revision = 'b3e9a4c7d210'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # триграммный GIN обслуживает name ILIKE '%...%' без полного просмотра таблицы
+    op.execute("CREATE INDEX ix_organizations_name_trgm ON organizations USING gin (name gin_trgm_ops)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_organizations_name_trgm")
@@ -0,0 +1,16 @@
+from alembic import op
+
+revision: str = 'd9f2b6c4e817'
+down_revision = 'c5e1a8d3f604'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # массовый импорт сопоставляет здания по адресу; hash, а не btree: адрес до 1024 символов
+    # может не поместиться в строку btree-индекса
+    op.execute("CREATE INDEX ix_buildings_address ON buildings USING hash (address)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_buildings_address")
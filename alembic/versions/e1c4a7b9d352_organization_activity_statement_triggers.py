@@ -0,0 +1,170 @@
+from alembic import op
+
+revision: str = 'e1c4a7b9d352'
+down_revision = 'd9f2b6c4e817'
+branch_labels = None
+depends_on = None
+
+# документ: название (вес A) + названия деятельностей вместе с их предками (B) + адрес здания (C),
+# чтобы поиск по "Еда" находил организации с "Мясной продукцией"
+SEARCH_DOCUMENT_WITH_ANCESTORS = """
+    CREATE OR REPLACE FUNCTION organization_search_document(org_id integer, org_name text, org_building_id integer)
+    RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('russian', coalesce(org_name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce((
+                   SELECT string_agg(activity.name, ' ' ORDER BY activity.activity_type_id)
+                   FROM activity_types AS activity
+                   WHERE activity.activity_type_id IN (
+                       SELECT closure.ancestor_id
+                       FROM organization_activity AS link
+                       JOIN activity_type_closure AS closure ON closure.descendant_id = link.activity_type_id
+                       WHERE link.organization_id = org_id
+                   )
+               ), '')), 'B')
+            || setweight(to_tsvector('russian', coalesce((
+                   SELECT building.address FROM buildings AS building WHERE building.building_id = org_building_id
+               ), '')), 'C')
+    $$ LANGUAGE sql STABLE
+"""
+
+SEARCH_DOCUMENT_DIRECT = """
+    CREATE OR REPLACE FUNCTION organization_search_document(org_id integer, org_name text, org_building_id integer)
+    RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('russian', coalesce(org_name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce((
+                   SELECT string_agg(activity.name, ' ')
+                   FROM organization_activity AS link
+                   JOIN activity_types AS activity ON activity.activity_type_id = link.activity_type_id
+                   WHERE link.organization_id = org_id
+               ), '')), 'B')
+            || setweight(to_tsvector('russian', coalesce((
+                   SELECT building.address FROM buildings AS building WHERE building.building_id = org_building_id
+               ), '')), 'C')
+    $$ LANGUAGE sql STABLE
+"""
+
+# привязки к деятельностям обрабатывает свой триггер уровня оператора; деятельность входит в документы
+# организаций всего своего поддерева, поэтому переименование и перенос пересчитывают их все
+REFRESH_WITHOUT_LINKS = """
+    CREATE OR REPLACE FUNCTION organizations_search_document_refresh() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'activity_types' THEN
+            UPDATE organizations
+            SET search_document = organization_search_document(organization_id, name, building_id)
+            WHERE organization_id IN (
+                SELECT link.organization_id
+                FROM organization_activity AS link
+                JOIN activity_type_closure AS closure ON closure.descendant_id = link.activity_type_id
+                WHERE closure.ancestor_id = NEW.activity_type_id
+            );
+        ELSIF TG_TABLE_NAME = 'buildings' THEN
+            UPDATE organizations
+            SET search_document = organization_search_document(organization_id, name, building_id)
+            WHERE building_id = NEW.building_id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+REFRESH_WITH_LINKS = """
+    CREATE OR REPLACE FUNCTION organizations_search_document_refresh() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'organization_activity' THEN
+            UPDATE organizations
+            SET search_document = organization_search_document(organization_id, name, building_id)
+            WHERE organization_id = CASE WHEN TG_OP = 'DELETE' THEN OLD.organization_id
+                                         ELSE NEW.organization_id END;
+        ELSIF TG_TABLE_NAME = 'activity_types' THEN
+            UPDATE organizations
+            SET search_document = organization_search_document(organization_id, name, building_id)
+            WHERE organization_id IN (
+                SELECT organization_id FROM organization_activity WHERE activity_type_id = NEW.activity_type_id
+            );
+        ELSIF TG_TABLE_NAME = 'buildings' THEN
+            UPDATE organizations
+            SET search_document = organization_search_document(organization_id, name, building_id)
+            WHERE building_id = NEW.building_id;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# документы меняются только у организаций с деятельностями
+REFRESH_LINKED_DOCUMENTS = """
+    UPDATE organizations
+    SET search_document = organization_search_document(organization_id, name, building_id)
+    WHERE organization_id IN (SELECT organization_id FROM organization_activity)
+"""
+
+
+def upgrade():
+    op.execute(SEARCH_DOCUMENT_WITH_ANCESTORS)
+    op.execute(REFRESH_WITHOUT_LINKS)
+
+    # перенос деятельности меняет предков всего поддерева; триггер замыкания (activity_types_closure_move)
+    # срабатывает раньше по имени, так что поддерево уже пересчитано
+    op.execute("DROP TRIGGER IF EXISTS activity_types_search_document ON activity_types")
+    op.execute("""
+        CREATE TRIGGER activity_types_search_document
+        AFTER UPDATE OF name, parent_id ON activity_types
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+        EXECUTE FUNCTION organizations_search_document_refresh()
+    """)
+
+    # построчный триггер делал отдельный UPDATE organizations на каждую привязку, а каждый такой UPDATE —
+    # своё увеличение data_version и NOTIFY; теперь один UPDATE на оператор по таблице переходов
+    op.execute("DROP TRIGGER IF EXISTS organization_activity_search_document ON organization_activity")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION organization_activity_search_document_refresh() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE organizations
+                SET search_document = organization_search_document(organization_id, name, building_id)
+                WHERE organization_id IN (SELECT DISTINCT organization_id FROM new_rows);
+            ELSE
+                UPDATE organizations
+                SET search_document = organization_search_document(organization_id, name, building_id)
+                WHERE organization_id IN (SELECT DISTINCT organization_id FROM old_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # таблицы переходов допускаются только у триггеров на одно событие
+    op.execute("""
+        CREATE TRIGGER organization_activity_search_document_insert
+        AFTER INSERT ON organization_activity REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION organization_activity_search_document_refresh()
+    """)
+    op.execute("""
+        CREATE TRIGGER organization_activity_search_document_delete
+        AFTER DELETE ON organization_activity REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION organization_activity_search_document_refresh()
+    """)
+
+    op.execute(REFRESH_LINKED_DOCUMENTS)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS organization_activity_search_document_delete ON organization_activity")
+    op.execute("DROP TRIGGER IF EXISTS organization_activity_search_document_insert ON organization_activity")
+    op.execute("DROP FUNCTION IF EXISTS organization_activity_search_document_refresh()")
+
+    op.execute(SEARCH_DOCUMENT_DIRECT)
+    op.execute(REFRESH_WITH_LINKS)
+    op.execute("""
+        CREATE TRIGGER organization_activity_search_document
+        AFTER INSERT OR DELETE ON organization_activity
+        FOR EACH ROW EXECUTE FUNCTION organizations_search_document_refresh()
+    """)
+    op.execute("DROP TRIGGER IF EXISTS activity_types_search_document ON activity_types")
+    op.execute("""
+        CREATE TRIGGER activity_types_search_document
+        AFTER UPDATE OF name ON activity_types
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION organizations_search_document_refresh()
+    """)
+
+    op.execute(REFRESH_LINKED_DOCUMENTS)
@@ -0,0 +1,105 @@
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = 'e7a2c5f19b36'
+down_revision = 'd41f6e2b8a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('organizations', sa.Column('search_document', postgresql.TSVECTOR(), nullable=True))
+
+    # документ: название (вес A) + названия деятельностей (B) + адрес здания (C)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION organization_search_document(org_id integer, org_name text, org_building_id integer)
+        RETURNS tsvector AS $$
+            SELECT setweight(to_tsvector('russian', coalesce(org_name, '')), 'A')
+                || setweight(to_tsvector('russian', coalesce((
+                       SELECT string_agg(activity.name, ' ')
+                       FROM organization_activity AS link
+                       JOIN activity_types AS activity ON activity.activity_type_id = link.activity_type_id
+                       WHERE link.organization_id = org_id
+                   ), '')), 'B')
+                || setweight(to_tsvector('russian', coalesce((
+                       SELECT building.address FROM buildings AS building WHERE building.building_id = org_building_id
+                   ), '')), 'C')
+        $$ LANGUAGE sql STABLE
+    """)
+
+    op.execute("""
+        UPDATE organizations
+        SET search_document = organization_search_document(organization_id, name, building_id)
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION organizations_search_document_own() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_document := organization_search_document(NEW.organization_id, NEW.name, NEW.building_id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER organizations_search_document_own
+        BEFORE INSERT OR UPDATE OF name, building_id ON organizations
+        FOR EACH ROW EXECUTE FUNCTION organizations_search_document_own()
+    """)
+
+    # пересчёт документов при изменении связанных таблиц; UPDATE только search_document
+    # не попадает под триггер выше (он ограничен колонками name, building_id)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION organizations_search_document_refresh() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'organization_activity' THEN
+                UPDATE organizations
+                SET search_document = organization_search_document(organization_id, name, building_id)
+                WHERE organization_id = CASE WHEN TG_OP = 'DELETE' THEN OLD.organization_id
+                                             ELSE NEW.organization_id END;
+            ELSIF TG_TABLE_NAME = 'activity_types' THEN
+                UPDATE organizations
+                SET search_document = organization_search_document(organization_id, name, building_id)
+                WHERE organization_id IN (
+                    SELECT organization_id FROM organization_activity WHERE activity_type_id = NEW.activity_type_id
+                );
+            ELSIF TG_TABLE_NAME = 'buildings' THEN
+                UPDATE organizations
+                SET search_document = organization_search_document(organization_id, name, building_id)
+                WHERE building_id = NEW.building_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER organization_activity_search_document
+        AFTER INSERT OR DELETE ON organization_activity
+        FOR EACH ROW EXECUTE FUNCTION organizations_search_document_refresh()
+    """)
+    op.execute("""
+        CREATE TRIGGER activity_types_search_document
+        AFTER UPDATE OF name ON activity_types
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION organizations_search_document_refresh()
+    """)
+    op.execute("""
+        CREATE TRIGGER buildings_search_document
+        AFTER UPDATE OF address ON buildings
+        FOR EACH ROW WHEN (OLD.address IS DISTINCT FROM NEW.address)
+        EXECUTE FUNCTION organizations_search_document_refresh()
+    """)
+
+    op.execute("CREATE INDEX ix_organizations_search_document ON organizations USING gin (search_document)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_organizations_search_document")
+    op.execute("DROP TRIGGER IF EXISTS buildings_search_document ON buildings")
+    op.execute("DROP TRIGGER IF EXISTS activity_types_search_document ON activity_types")
+    op.execute("DROP TRIGGER IF EXISTS organization_activity_search_document ON organization_activity")
+    op.execute("DROP FUNCTION IF EXISTS organizations_search_document_refresh()")
+    op.execute("DROP TRIGGER IF EXISTS organizations_search_document_own ON organizations")
+    op.execute("DROP FUNCTION IF EXISTS organizations_search_document_own()")
+    op.execute("DROP FUNCTION IF EXISTS organization_search_document(integer, text, integer)")
+    op.drop_column('organizations', 'search_document')
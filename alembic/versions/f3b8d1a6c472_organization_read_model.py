@@ -0,0 +1,97 @@
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = 'f3b8d1a6c472'
+down_revision = 'e7a2c5f19b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'organization_read_model',
+        sa.Column('organization_id', sa.Integer(),
+                  sa.ForeignKey('organizations.organization_id', ondelete='CASCADE'),
+                  primary_key=True, nullable=False),
+        sa.Column('document', postgresql.JSONB(), nullable=True),
+        sa.Column('generation', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+
+    # строки заводятся сразу, документы заполняются при первом чтении
+    op.execute("INSERT INTO organization_read_model (organization_id) SELECT organization_id FROM organizations")
+
+    # сброс документа: generation сдвигается, чтобы параллельное чтение не записало устаревшую версию
+    op.execute("""
+        CREATE OR REPLACE FUNCTION organization_read_model_invalidate() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'organizations' THEN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO organization_read_model (organization_id) VALUES (NEW.organization_id);
+                ELSE
+                    UPDATE organization_read_model SET document = NULL, generation = generation + 1
+                    WHERE organization_id = NEW.organization_id;
+                END IF;
+            ELSIF TG_TABLE_NAME IN ('phones', 'organization_activity') THEN
+                IF TG_OP <> 'INSERT' THEN
+                    UPDATE organization_read_model SET document = NULL, generation = generation + 1
+                    WHERE organization_id = OLD.organization_id;
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    UPDATE organization_read_model SET document = NULL, generation = generation + 1
+                    WHERE organization_id = NEW.organization_id;
+                END IF;
+            ELSIF TG_TABLE_NAME = 'buildings' THEN
+                UPDATE organization_read_model SET document = NULL, generation = generation + 1
+                WHERE organization_id IN (
+                    SELECT organization_id FROM organizations WHERE building_id = NEW.building_id
+                );
+            ELSIF TG_TABLE_NAME = 'activity_types' THEN
+                -- деятельность входит в деревья всех организаций, привязанных к её поддереву
+                UPDATE organization_read_model SET document = NULL, generation = generation + 1
+                WHERE organization_id IN (
+                    SELECT link.organization_id
+                    FROM activity_type_closure AS closure
+                    JOIN organization_activity AS link ON link.activity_type_id = closure.descendant_id
+                    WHERE closure.ancestor_id = NEW.activity_type_id
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER organizations_read_model
+        AFTER INSERT OR UPDATE OF name, building_id ON organizations
+        FOR EACH ROW EXECUTE FUNCTION organization_read_model_invalidate()
+    """)
+    op.execute("""
+        CREATE TRIGGER phones_read_model
+        AFTER INSERT OR UPDATE OR DELETE ON phones
+        FOR EACH ROW EXECUTE FUNCTION organization_read_model_invalidate()
+    """)
+    op.execute("""
+        CREATE TRIGGER organization_activity_read_model
+        AFTER INSERT OR UPDATE OR DELETE ON organization_activity
+        FOR EACH ROW EXECUTE FUNCTION organization_read_model_invalidate()
+    """)
+    op.execute("""
+        CREATE TRIGGER buildings_read_model
+        AFTER UPDATE ON buildings
+        FOR EACH ROW EXECUTE FUNCTION organization_read_model_invalidate()
+    """)
+    op.execute("""
+        CREATE TRIGGER activity_types_read_model
+        AFTER UPDATE OF name, parent_id ON activity_types
+        FOR EACH ROW EXECUTE FUNCTION organization_read_model_invalidate()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS activity_types_read_model ON activity_types")
+    op.execute("DROP TRIGGER IF EXISTS buildings_read_model ON buildings")
+    op.execute("DROP TRIGGER IF EXISTS organization_activity_read_model ON organization_activity")
+    op.execute("DROP TRIGGER IF EXISTS phones_read_model ON phones")
+    op.execute("DROP TRIGGER IF EXISTS organizations_read_model ON organizations")
+    op.execute("DROP FUNCTION IF EXISTS organization_read_model_invalidate()")
+    op.drop_table('organization_read_model')
@@ -0,0 +1,322 @@
+# Массовый импорт справочника из CSV или NDJSON.
+# Записи читаются потоком и пачками по batch_size заливаются COPY во временные таблицы,
+# откуда сливаются в основные таблицы INSERT ... SELECT; каждая пачка — отдельная транзакция.
+# Повторный импорт того же файла ничего не дублирует: здания сопоставляются по адресу, организации — по названию,
+# телефоны и привязки к деятельностям только добавляются.
+#
+# Поля записи: name, address, latitude, longitude, phones, activities.
+# CSV: phones и activities — списки через ";", путь деятельности — названия от корня через "/"
+#   (например, "Еда/Молочная продукция;Автомобили/Легковые/Запчасти").
+# NDJSON: phones — список строк, activities — список путей (строка через "/" или список названий).
+#
+# Запуск: python -m app.bulk_import data.csv [--format csv|ndjson] [--batch-size 10000]
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+import asyncpg
+
+from app.core.constants import BULK_IMPORT_BATCH_SIZE
+from app.utils.db import ASYNCPG_DSN
+
+logger = logging.getLogger(__name__)
+
+LIST_SEPARATOR = ";"
+PATH_SEPARATOR = "/"
+
+ActivityPath = Tuple[str, ...]
+
+
+class ImportRecord(NamedTuple):
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    phones: Tuple[str, ...] = ()
+    activities: Tuple[ActivityPath, ...] = ()
+
+
+def _split_path(path) -> ActivityPath:
+    names = path.split(PATH_SEPARATOR) if isinstance(path, str) else path
+    return tuple(name.strip() for name in names if name.strip())
+
+
+def _make_record(line_number: int, name, address, latitude, longitude, phones, activities) -> ImportRecord:
+    try:
+        record = ImportRecord(
+            name=str(name).strip(),
+            address=str(address).strip(),
+            latitude=float(latitude),
+            longitude=float(longitude),
+            phones=tuple(str(phone).strip() for phone in phones if str(phone).strip()),
+            activities=tuple(path for path in (_split_path(path) for path in activities) if path),
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Line {line_number}: {e}") from e
+    if not record.name or not record.address:
+        raise ValueError(f"Line {line_number}: name and address are required")
+    if not (-90.0 <= record.latitude <= 90.0 and -180.0 <= record.longitude <= 180.0):
+        raise ValueError(f"Line {line_number}: coordinates out of range")
+    return record
+
+
+def read_csv(stream: TextIO) -> Iterator[ImportRecord]:
+    # строка 1 — заголовок
+    for line_number, row in enumerate(csv.DictReader(stream), start=2):
+        yield _make_record(
+            line_number,
+            row.get("name"),
+            row.get("address"),
+            row.get("latitude"),
+            row.get("longitude"),
+            (row.get("phones") or "").split(LIST_SEPARATOR),
+            (row.get("activities") or "").split(LIST_SEPARATOR),
+        )
+
+
+def read_ndjson(stream: TextIO) -> Iterator[ImportRecord]:
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from e
+        yield _make_record(
+            line_number,
+            item.get("name"),
+            item.get("address"),
+            item.get("latitude"),
+            item.get("longitude"),
+            [phone["number"] if isinstance(phone, dict) else phone for phone in item.get("phones") or []],
+            item.get("activities") or [],
+        )
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def batched(records: Iterable[ImportRecord], batch_size: int) -> Iterator[List[ImportRecord]]:
+    batch: List[ImportRecord] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_stats(stats: Counter) -> str:
+    return ", ".join(f"{name}={count}" for name, count in stats.items())
+
+
+def _inserted(status: str) -> int:
+    # asyncpg возвращает тег команды: "INSERT 0 <строк>"
+    return int(status.rsplit(" ", 1)[-1])
+
+
+# Пути деятельностей -> id: дерево activity_types целиком в памяти (оно небольшое),
+# недостающие узлы создаются уровнями, чтобы триггер замыкания видел родителей
+class ActivityResolver:
+    def __init__(self):
+        self._ids: Dict[Tuple[Optional[int], str], int] = {}
+
+    async def load(self, connection: asyncpg.Connection) -> None:
+        rows = await connection.fetch(
+            "SELECT activity_type_id, name, parent_id FROM activity_types ORDER BY activity_type_id"
+        )
+        self._ids = {}
+        for row in rows:
+            self._ids.setdefault((row["parent_id"], row["name"]), row["activity_type_id"])
+
+    async def resolve(self, connection: asyncpg.Connection, paths: Iterable[ActivityPath]) -> \
+            Tuple[Dict[ActivityPath, int], int]:
+        paths = set(paths)
+        resolved: Dict[ActivityPath, int] = {(): None}
+        created = 0
+        for depth in range(max((len(path) for path in paths), default=0)):
+            prefixes = {path[:depth + 1] for path in paths if len(path) > depth}
+            missing = sorted({
+                (resolved[prefix[:-1]], prefix[-1]) for prefix in prefixes
+                if (resolved[prefix[:-1]], prefix[-1]) not in self._ids
+            }, key=lambda key: (key[0] or 0, key[1]))
+            if missing:
+                rows = await connection.fetch(
+                    """
+                    INSERT INTO activity_types (name, parent_id)
+                    SELECT name, parent_id FROM unnest($1::text[], $2::integer[]) AS missing(name, parent_id)
+                    RETURNING activity_type_id, name, parent_id
+                    """,
+                    [name for _, name in missing],
+                    [parent_id for parent_id, _ in missing],
+                )
+                for row in rows:
+                    self._ids[(row["parent_id"], row["name"])] = row["activity_type_id"]
+                created += len(rows)
+            for prefix in prefixes:
+                resolved[prefix] = self._ids[(resolved[prefix[:-1]], prefix[-1])]
+        del resolved[()]
+        return resolved, created
+
+
+STAGING_TABLES = """
+    CREATE TEMP TABLE IF NOT EXISTS import_organizations (
+        name text, address text, latitude double precision, longitude double precision
+    ) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS import_phones (organization_name text, number text) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS import_activities (
+        organization_name text, activity_type_id integer
+    ) ON COMMIT DELETE ROWS;
+"""
+
+# новые здания; здание с тем же адресом уже есть — берём его
+MERGE_BUILDINGS = """
+    INSERT INTO buildings (address, latitude, longitude)
+    SELECT DISTINCT ON (s.address) s.address, s.latitude, s.longitude
+    FROM import_organizations AS s
+    WHERE NOT EXISTS (SELECT 1 FROM buildings AS b WHERE b.address = s.address)
+    ORDER BY s.address
+"""
+
+MERGE_ORGANIZATIONS = """
+    INSERT INTO organizations (name, building_id)
+    SELECT s.name, (SELECT min(b.building_id) FROM buildings AS b WHERE b.address = s.address)
+    FROM import_organizations AS s
+    ON CONFLICT (name) DO UPDATE SET building_id = EXCLUDED.building_id
+    WHERE organizations.building_id IS DISTINCT FROM EXCLUDED.building_id
+"""
+
+MERGE_PHONES = """
+    INSERT INTO phones (number, organization_id)
+    SELECT DISTINCT s.number, o.organization_id
+    FROM import_phones AS s
+    JOIN organizations AS o ON o.name = s.organization_name
+    WHERE NOT EXISTS (
+        SELECT 1 FROM phones AS p WHERE p.organization_id = o.organization_id AND p.number = s.number
+    )
+"""
+
+MERGE_ACTIVITIES = """
+    INSERT INTO organization_activity (organization_id, activity_type_id)
+    SELECT DISTINCT o.organization_id, s.activity_type_id
+    FROM import_activities AS s
+    JOIN organizations AS o ON o.name = s.organization_name
+    ON CONFLICT DO NOTHING
+"""
+
+
+class BulkImporter:
+    def __init__(self, connection: asyncpg.Connection, batch_size: int = BULK_IMPORT_BATCH_SIZE):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.activities = ActivityResolver()
+        # records, buildings, organizations, phones, activity_types, activity_links
+        self.stats: Counter = Counter()
+
+    async def prepare(self) -> None:
+        await self.connection.execute(STAGING_TABLES)
+        await self.activities.load(self.connection)
+
+    async def import_records(self, records: Iterable[ImportRecord]) -> Counter:
+        await self.prepare()
+        started = time.perf_counter()
+        for batch in batched(records, self.batch_size):
+            await self.import_batch(batch)
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "Imported %d records (%.0f records/s): %s",
+                self.stats["records"], self.stats["records"] / elapsed if elapsed else 0.0, format_stats(self.stats),
+            )
+        return self.stats
+
+    async def import_batch(self, batch: Sequence[ImportRecord]) -> None:
+        connection = self.connection
+        try:
+            async with connection.transaction():
+                activity_ids, created = await self.activities.resolve(
+                    connection, (path for record in batch for path in record.activities)
+                )
+
+                # при повторе названия в пачке побеждает последняя запись
+                latest = {record.name: record for record in batch}
+                await connection.copy_records_to_table(
+                    "import_organizations",
+                    records=[
+                        (record.name, record.address, record.latitude, record.longitude) for record in latest.values()
+                    ],
+                    columns=["name", "address", "latitude", "longitude"],
+                )
+                await connection.copy_records_to_table(
+                    "import_phones",
+                    records=[(record.name, phone) for record in batch for phone in record.phones],
+                    columns=["organization_name", "number"],
+                )
+                await connection.copy_records_to_table(
+                    "import_activities",
+                    records=[(record.name, activity_ids[path]) for record in batch for path in record.activities],
+                    columns=["organization_name", "activity_type_id"],
+                )
+                # статистика временных таблиц сама не собирается, без неё планировщик ошибается с соединениями
+                await connection.execute("ANALYZE import_organizations, import_phones, import_activities")
+
+                buildings = _inserted(await connection.execute(MERGE_BUILDINGS))
+                organizations = _inserted(await connection.execute(MERGE_ORGANIZATIONS))
+                phones = _inserted(await connection.execute(MERGE_PHONES))
+                activity_links = _inserted(await connection.execute(MERGE_ACTIVITIES))
+        except Exception:
+            # созданные в откаченной транзакции деятельности в памяти остались — перечитываем дерево
+            await self.activities.load(connection)
+            raise
+
+        self.stats.update(
+            records=len(batch),
+            buildings=buildings,
+            organizations=organizations,
+            phones=phones,
+            activity_types=created,
+            activity_links=activity_links,
+        )
+
+
+async def run_import(records: Iterable[ImportRecord], batch_size: int = BULK_IMPORT_BATCH_SIZE,
+                     dsn: str = ASYNCPG_DSN) -> Counter:
+    connection = await asyncpg.connect(dsn)
+    try:
+        return await BulkImporter(connection, batch_size).import_records(records)
+    finally:
+        await connection.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import of buildings, organizations, phones and activities")
+    parser.add_argument("path", help="CSV or NDJSON file, '-' for stdin")
+    parser.add_argument("--format", choices=sorted(READERS), help="input format (by default from the extension)")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    input_format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+    try:
+        stats = asyncio.run(run_import(READERS[input_format](stream), args.batch_size))
+    except ValueError as e:
+        logger.error("Import stopped: %s", e)
+        return 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    logger.info("Import finished: %s", format_stats(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,94 +1,88 @@
-from typing import Iterable, List, Set, Union, Optional, Dict
+from typing import Iterable, List, Set, Union, Optional, Dict, Mapping, Tuple, TypeVar
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.constants import MAX_DEPTH_DEFAULT
 from app.models.activity_type import ActivityType
+from app.repositories.activities_repository import ActivitiesRepository
 
+K = TypeVar("K")
 
-# Функция постройки дерева активностей
-async def build_activity_hierarchy(
-        session: AsyncSession,
-        activities_or_ids: Iterable[Union[ActivityType, int]],
-        max_depth: int = MAX_DEPTH_DEFAULT,
-) -> List[Dict]:
-    # нормализуем вход в set of ids
-    start_ids: Set[int] = set()
+
+def normalize_activity_ids(activities_or_ids: Iterable[Union[ActivityType, int]]) -> Set[int]:
+    ids: Set[int] = set()
     for it in activities_or_ids or []:
         if isinstance(it, ActivityType):
-            start_ids.add(int(it.activity_type_id))
+            ids.add(int(it.activity_type_id))
         else:
-            start_ids.add(int(it))
+            ids.add(int(it))
+    return ids
+
+
+def depth_exceeded_error(max_depth: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Activity tree depth exceeds allowed maximum of {max_depth}"
+    )
 
-    if not start_ids:
-        return []
 
-    # 1) поднимаемся вверх от start_ids собирая родителей до max_depth
+# Подъём к родителям по уже загруженной карте child -> parent (без обращений к БД)
+def collect_ancestor_ids(
+        start_ids: Set[int],
+        parent_of: Mapping[int, Optional[int]],
+        max_depth: int = MAX_DEPTH_DEFAULT,
+) -> Set[int]:
     all_ids: Set[int] = set(start_ids)
     current_level: Set[int] = set(start_ids)
     depth = 0
-    child_to_parent: Dict[int, Optional[int]] = {}
 
     while current_level:
         if depth >= max_depth:
-            # проверяем, есть ли ещё родители вне all_ids — тогда превышаем лимит
-            stmt = select(ActivityType.parent_id).where(ActivityType.activity_type_id.in_(list(all_ids)))
-            res = await session.execute(stmt)
-            parents = [r[0] for r in res.fetchall() if r[0] is not None]
-            if any(p not in all_ids for p in parents):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Activity tree depth exceeds allowed maximum of {max_depth}"
-                )
+            if any(
+                    parent_of.get(aid) is not None and parent_of[aid] not in all_ids
+                    for aid in current_level
+            ):
+                raise depth_exceeded_error(max_depth)
             break
 
-        stmt = select(ActivityType.activity_type_id, ActivityType.parent_id).where(
-            ActivityType.activity_type_id.in_(list(current_level))
-        )
-        res = await session.execute(stmt)
-        rows = res.fetchall()
-
         next_level: Set[int] = set()
-        for aid, parent in rows:
-            child_to_parent[int(aid)] = int(parent) if parent is not None else None
-            if parent is not None and int(parent) not in all_ids:
-                all_ids.add(int(parent))
-                next_level.add(int(parent))
+        for aid in current_level:
+            parent = parent_of.get(aid)
+            if parent is not None and parent not in all_ids:
+                all_ids.add(parent)
+                next_level.add(parent)
 
         current_level = next_level
         depth += 1
 
-    # 2) загружаем все ActivityType для all_ids
-    stmt = select(ActivityType).where(ActivityType.activity_type_id.in_(list(all_ids)))
-    res = await session.execute(stmt)
-    activities = res.scalars().all()
+    return all_ids
 
-    # map id -> node dict
+
+# Сборка дерева из строк (activity_type_id, name, parent_id)
+def assemble_activity_tree(nodes: Iterable[Tuple[int, str, Optional[int]]]) -> List[Dict]:
     node_map: Dict[int, Dict] = {}
-    for activity in activities:
-        node_map[int(activity.activity_type_id)] = {
-            "activity_type_id": int(activity.activity_type_id),
-            "name": activity.name,
-            "parent_id": int(activity.parent_id) if activity.parent_id is not None else None,
+    for activity_type_id, name, parent_id in nodes:
+        node_map[int(activity_type_id)] = {
+            "activity_type_id": int(activity_type_id),
+            "name": name,
+            "parent_id": int(parent_id) if parent_id is not None else None,
             "children": []
         }
 
-    # 3) связываем parent -> children (дети добавляются в parent)
-    # используем child_to_parent
-    for child_id, node in list(node_map.items()):
-        parent_id = child_to_parent.get(child_id, node.get("parent_id"))
+    # связываем parent -> children (дети добавляются в parent)
+    for child_id, node in node_map.items():
+        parent_id = node["parent_id"]
         if parent_id is not None and parent_id in node_map:
-            node_map[parent_id]["children"].append(node_map[child_id])
+            node_map[parent_id]["children"].append(node)
 
-    # 4) корневые узлы — те, у которых parent_id is None или parent не загружен
+    # корневые узлы — те, у которых parent_id is None или parent не загружен
     roots = [
         n for nid, n in node_map.items()
         if n["parent_id"] is None or n["parent_id"] not in node_map
     ]
 
-    # 5) сортировка для детерминизма
+    # сортировка для детерминизма
     def sort_rec(list_activities: List[Dict]):
         list_activities.sort(key=lambda x: (x.get("name") or "").lower())
         for item in list_activities:
@@ -97,3 +91,45 @@ async def build_activity_hierarchy(
 
     sort_rec(roots)
     return roots
+
+
+# Деревья для нескольких наборов активностей по уже загруженным картам id -> name / parent
+def build_hierarchies_from_maps(
+        activities_by_key: Mapping[K, Iterable[Union[ActivityType, int]]],
+        names: Mapping[int, str],
+        parent_of: Mapping[int, Optional[int]],
+        max_depth: int = MAX_DEPTH_DEFAULT,
+) -> Dict[K, List[Dict]]:
+    result: Dict[K, List[Dict]] = {}
+    for key, activities_or_ids in activities_by_key.items():
+        start_ids = normalize_activity_ids(activities_or_ids)
+        if not start_ids:
+            result[key] = []
+            continue
+        all_ids = collect_ancestor_ids(start_ids, parent_of, max_depth)
+        result[key] = assemble_activity_tree(
+            (aid, names[aid], parent_of[aid]) for aid in all_ids if aid in names
+        )
+    return result
+
+
+# Пакетная постройка деревьев: все предки для всей выборки собираются одним запросом по activity_type_closure
+async def build_activity_hierarchies(
+        session: AsyncSession,
+        activities_by_key: Mapping[K, Iterable[Union[ActivityType, int]]],
+        max_depth: int = MAX_DEPTH_DEFAULT,
+) -> Dict[K, List[Dict]]:
+    activities_by_key = {key: normalize_activity_ids(value) for key, value in activities_by_key.items()}
+    start_ids: Set[int] = set().union(*activities_by_key.values())
+    if not start_ids:
+        return {key: [] for key in activities_by_key}
+
+    rows = await ActivitiesRepository.get_ancestors(session, start_ids, max_depth)
+
+    names: Dict[int, str] = {}
+    parent_of: Dict[int, Optional[int]] = {}
+    for aid, name, parent_id in rows:
+        names[int(aid)] = name
+        parent_of[int(aid)] = int(parent_id) if parent_id is not None else None
+
+    return build_hierarchies_from_maps(activities_by_key, names, parent_of, max_depth)
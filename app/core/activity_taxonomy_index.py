@@ -0,0 +1,51 @@
+import logging
+from os import getenv
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.activity_hierarchy import K, build_hierarchies_from_maps
+from app.core.constants import MAX_DEPTH_DEFAULT
+from app.core.in_memory_index import InMemoryIndex
+from app.models.activity_type import ActivityType
+from app.utils.change_tracking import on_table_change
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_TAXONOMY_INDEX_ENABLED = getenv("ACTIVITY_TAXONOMY_INDEX", "true").lower() in ("1", "true", "yes")
+
+
+# Копия activity_types в памяти процесса: деревья деятельностей строятся без обращений к БД
+class ActivityTaxonomyIndex(InMemoryIndex):
+    def __init__(self):
+        super().__init__()
+        self._names: Dict[int, str] = {}
+        self._parents: Dict[int, Optional[int]] = {}
+
+    async def _load(self, session: AsyncSession) -> None:
+        res = await session.execute(
+            select(ActivityType.activity_type_id, ActivityType.name, ActivityType.parent_id)
+        )
+
+        names: Dict[int, str] = {}
+        parents: Dict[int, Optional[int]] = {}
+        for aid, name, parent_id in res.fetchall():
+            aid = int(aid)
+            names[aid] = name
+            parents[aid] = int(parent_id) if parent_id is not None else None
+
+        self._names, self._parents = names, parents
+        logger.info("Activity taxonomy index loaded: %d activity types", len(names))
+
+    def build_hierarchies(
+            self,
+            activities_by_key: Mapping[K, Iterable[Union[ActivityType, int]]],
+            max_depth: int = MAX_DEPTH_DEFAULT,
+    ) -> Dict[K, List[Dict]]:
+        return build_hierarchies_from_maps(activities_by_key, self._names, self._parents, max_depth)
+
+
+activity_taxonomy_index = ActivityTaxonomyIndex()
+
+on_table_change("activity_types", activity_taxonomy_index.invalidate)
@@ -1,2 +1,16 @@
 MAX_DEPTH_DEFAULT = 3
 EARTH_RADIUS = 6371.0
+MAX_SUBTREE_DEPTH = 32
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 500
+SPATIAL_GRID_CELL_DEG = 0.01
+NEAREST_INITIAL_RADIUS_KM = 1.0
+NEAREST_DIRECT_CANDIDATES_MAX = 10_000
+MAX_SEARCH_RADIUS_KM = 20038.0
+SUGGEST_LIMIT_DEFAULT = 10
+SUGGEST_LIMIT_MAX = 50
+FULLTEXT_CONFIG = "russian"
+BATCH_MAX_IDS = 500
+BULK_IMPORT_BATCH_SIZE = 10_000
+SPATIAL_INDEX_MAX_OVERLAY = 1000
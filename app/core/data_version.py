@@ -0,0 +1,46 @@
+import time
+from os import getenv
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.in_memory_index import InMemoryIndex
+from app.models.data_version import data_version as data_version_table
+from app.utils.change_tracking import REFERENCE_TABLES, on_table_change
+
+# как долго версия из памяти считается актуальной: записи мимо этого процесса видны не позже чем через TTL
+DATA_VERSION_TTL = float(getenv("DATA_VERSION_TTL", "1.0"))
+
+
+# Версия данных справочника, закешированная в памяти процесса
+class DataVersion(InMemoryIndex):
+    def __init__(self, ttl: float = DATA_VERSION_TTL):
+        super().__init__()
+        self._ttl = ttl
+        self._version = 0
+        self._loaded_at = 0.0
+
+    @property
+    def value(self) -> int:
+        return self._version
+
+    # проверка без обращения к БД: загружена и не старше TTL
+    @property
+    def is_fresh(self) -> bool:
+        return self._loaded and time.monotonic() - self._loaded_at <= self._ttl
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        if self._loaded and not self.is_fresh:
+            self._loaded = False
+        await super().ensure_loaded(session)
+
+    async def _load(self, session: AsyncSession) -> None:
+        res = await session.execute(select(data_version_table.c.version))
+        self._version = int(res.scalar_one_or_none() or 0)
+        self._loaded_at = time.monotonic()
+
+
+data_version = DataVersion()
+
+for _table in REFERENCE_TABLES:
+    on_table_change(_table, data_version.invalidate)
@@ -0,0 +1,98 @@
+from math import degrees, radians, sin, cos, sqrt, asin
+from typing import List, Sequence, Tuple
+
+from app.core.constants import EARTH_RADIUS
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: без него работает построчная реализация
+    np = None
+
+
+def haversine_km(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    dlon = radians(lon2 - lon1)
+    dlat = radians(lat2 - lat1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    c = 2 * asin(min(1.0, sqrt(a)))
+    return EARTH_RADIUS * c
+
+
+# Расстояния от точки (lat, lon) до массива точек одним векторным проходом
+def haversine_km_many(lon: float, lat: float, lons: Sequence[float], lats: Sequence[float]) -> Sequence[float]:
+    if np is None:
+        return [haversine_km(lon, lat, b_lon, b_lat) for b_lon, b_lat in zip(lons, lats)]
+
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    dlon = np.radians(lons - lon)
+    dlat = np.radians(lats - lat)
+    a = np.sin(dlat / 2) ** 2 + cos(radians(lat)) * np.cos(np.radians(lats)) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# (id, расстояние) для точек, попавших в BBOX радиуса и в сам радиус
+def within_radius_with_distances(
+        lat: float,
+        lon: float,
+        radius_km: float,
+        ids: Sequence[int],
+        lats: Sequence[float],
+        lons: Sequence[float],
+) -> List[Tuple[int, float]]:
+    boxes = radius_bboxes(lat, lon, radius_km)
+
+    if np is None:
+        result = []
+        for point_id, p_lat, p_lon in zip(ids, lats, lons):
+            if any(lat_lo <= p_lat <= lat_hi and lon_lo <= p_lon <= lon_hi
+                   for lat_lo, lon_lo, lat_hi, lon_hi in boxes):
+                distance = haversine_km(lon, lat, p_lon, p_lat)
+                if distance <= radius_km:
+                    result.append((point_id, distance))
+        return result
+
+    ids = np.asarray(ids)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    mask = np.zeros(len(ids), dtype=bool)
+    for lat_lo, lon_lo, lat_hi, lon_hi in boxes:
+        mask |= (lats >= lat_lo) & (lats <= lat_hi) & (lons >= lon_lo) & (lons <= lon_hi)
+    ids, lats, lons = ids[mask], lats[mask], lons[mask]
+    distances = haversine_km_many(lon, lat, lons, lats)
+    inside = distances <= radius_km
+    return list(zip(ids[inside].tolist(), distances[inside].tolist()))
+
+
+def filter_within_radius(
+        lat: float,
+        lon: float,
+        radius_km: float,
+        ids: Sequence[int],
+        lats: Sequence[float],
+        lons: Sequence[float],
+) -> List[int]:
+    return [point_id for point_id, _ in within_radius_with_distances(lat, lon, radius_km, ids, lats, lons)]
+
+
+# BBOX-ы (lat_min, lon_min, lat_max, lon_max), вместе гарантированно содержащие круг радиуса radius_km
+# на сфере радиуса EARTH_RADIUS (тот же, что в haversine_km). Круг через антимеридиан делится на два BBOX-а,
+# круг с полюсом внутри занимает все долготы
+def radius_bboxes(lat: float, lon: float, radius_km: float) -> List[Tuple[float, float, float, float]]:
+    angle = radius_km / EARTH_RADIUS
+    deg_lat = degrees(angle)
+    lat_lo, lat_hi = lat - deg_lat, lat + deg_lat
+    if lat_lo <= -90.0 or lat_hi >= 90.0:
+        return [(max(lat_lo, -90.0), -180.0, min(lat_hi, 90.0), 180.0)]
+
+    ratio = sin(angle) / cos(radians(lat))
+    if ratio >= 1.0:
+        return [(lat_lo, -180.0, lat_hi, 180.0)]
+    deg_lon = degrees(asin(ratio))
+    lon_lo, lon_hi = lon - deg_lon, lon + deg_lon
+    if lon_hi - lon_lo >= 360.0:
+        return [(lat_lo, -180.0, lat_hi, 180.0)]
+    if lon_lo < -180.0:
+        return [(lat_lo, lon_lo + 360.0, lat_hi, 180.0), (lat_lo, -180.0, lat_hi, lon_hi)]
+    if lon_hi > 180.0:
+        return [(lat_lo, lon_lo, lat_hi, 180.0), (lat_lo, -180.0, lat_hi, lon_hi - 360.0)]
+    return [(lat_lo, lon_lo, lat_hi, lon_hi)]
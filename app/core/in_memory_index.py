@@ -0,0 +1,42 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Общая часть индексов в памяти процесса: ленивая загрузка и инвалидация при изменениях в БД
+class InMemoryIndex(ABC):
+    def __init__(self):
+        self._loaded = False
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    # растёт при каждой инвалидации: по нему видно, что пришли изменения
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate(self, key=None) -> None:
+        self._generation += 1
+        self._loaded = False
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self.load(session)
+
+    async def load(self, session: AsyncSession) -> None:
+        generation = self._generation
+        await self._load(session)
+        # если во время загрузки пришла инвалидация — данные могли устареть, перечитаем при следующем запросе
+        self._loaded = generation == self._generation
+
+    @abstractmethod
+    async def _load(self, session: AsyncSession) -> None:
+        ...
@@ -0,0 +1,143 @@
+import logging
+import re
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.in_memory_index import InMemoryIndex
+from app.models.organization import Organization
+from app.utils.change_tracking import on_table_change
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+# casefold + ё -> е, пунктуация и кавычки отбрасываются: 'ООО "Рога и Копыта"' -> 'ооо рога и копыта'
+def normalize_name(value: str) -> str:
+    return " ".join(_WORD.findall(value.casefold().replace("ё", "е")))
+
+
+def _name_words(name: str) -> Set[str]:
+    return set(normalize_name(name).split())
+
+
+# Автодополнение по началу любого слова названия: отсортированный список различных слов и для каждого слова
+# отсортированные id организаций. Название хранится один раз, хвосты названий не материализуются:
+# запрос из нескольких слов ищется по первому слову и проверяется по самому названию
+class OrganizationNameIndex(InMemoryIndex):
+    def __init__(self):
+        super().__init__()
+        self._names: Dict[int, str] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._words: List[str] = []
+        self._dirty: Set[int] = set()
+
+    def invalidate(self, key=None) -> None:
+        if key is None or not self._loaded:
+            super().invalidate()
+        else:
+            self._dirty.add(int(key))
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        await super().ensure_loaded(session)
+        if self._dirty:
+            async with self._lock:
+                await self._refresh_dirty(session)
+
+    async def _load(self, session: AsyncSession) -> None:
+        self._dirty = set()
+        res = await session.execute(
+            select(Organization.organization_id, Organization.name).order_by(Organization.organization_id)
+        )
+        names: Dict[int, str] = {}
+        postings: Dict[str, List[int]] = {}
+        for organization_id, name in res.fetchall():
+            organization_id = int(organization_id)
+            names[organization_id] = name
+            # id идут по возрастанию, поэтому списки сразу отсортированы
+            for word in _name_words(name):
+                postings.setdefault(word, []).append(organization_id)
+        self._names, self._postings, self._words = names, postings, sorted(postings)
+        logger.info("Organization name index loaded: %d organizations, %d words", len(names), len(postings))
+
+    async def _refresh_dirty(self, session: AsyncSession) -> None:
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        res = await session.execute(
+            select(Organization.organization_id, Organization.name).where(Organization.organization_id.in_(dirty))
+        )
+        fresh = {int(organization_id): name for organization_id, name in res.fetchall()}
+
+        # изменения собираются по словам, и список id каждого затронутого слова пересобирается один раз
+        removed: Dict[str, Set[int]] = {}
+        added: Dict[str, Set[int]] = {}
+        for organization_id in dirty:
+            old_name = self._names.pop(organization_id, None)
+            if old_name is not None:
+                for word in _name_words(old_name):
+                    removed.setdefault(word, set()).add(organization_id)
+            if organization_id in fresh:
+                self._names[organization_id] = fresh[organization_id]
+                for word in _name_words(fresh[organization_id]):
+                    added.setdefault(word, set()).add(organization_id)
+
+        created: List[str] = []
+        dropped: List[str] = []
+        for word in removed.keys() | added.keys():
+            current = self._postings.get(word)
+            ids = (set(current or ()) - removed.get(word, set())) | added.get(word, set())
+            if ids:
+                self._postings[word] = sorted(ids)
+                if current is None:
+                    created.append(word)
+            elif current is not None:
+                del self._postings[word]
+                dropped.append(word)
+
+        if len(created) + len(dropped) > len(self._words) // 64:
+            self._words = sorted(self._postings)
+            return
+        for word in dropped:
+            del self._words[bisect_left(self._words, word)]
+        for word in created:
+            insort(self._words, word)
+
+    def _matching_words(self, first: str, whole: bool) -> Iterator[str]:
+        if whole:
+            if first in self._postings:
+                yield first
+            return
+        position = bisect_left(self._words, first)
+        while position < len(self._words) and self._words[position].startswith(first):
+            yield self._words[position]
+            position += 1
+
+    def suggest(self, query: str, limit: int) -> List[Tuple[int, str]]:
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        # у запроса из нескольких слов первое слово совпадает со словом названия целиком
+        first, _, rest = prefix.partition(" ")
+        result: List[Tuple[int, str]] = []
+        seen: Set[int] = set()
+        for word in self._matching_words(first, whole=bool(rest)):
+            for organization_id in self._postings[word]:
+                if organization_id in seen:
+                    continue
+                name = self._names[organization_id]
+                if rest and f" {prefix}" not in f" {normalize_name(name)}":
+                    continue
+                seen.add(organization_id)
+                result.append((organization_id, name))
+                if len(result) >= limit:
+                    return result
+        return result
+
+
+organization_name_index = OrganizationNameIndex()
+
+on_table_change("organizations", organization_name_index.invalidate)
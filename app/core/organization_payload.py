@@ -0,0 +1,130 @@
+import logging
+from os import getenv
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import Row
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.activity_hierarchy import build_activity_hierarchies
+from app.core.activity_taxonomy_index import ACTIVITY_TAXONOMY_INDEX_ENABLED, activity_taxonomy_index
+from app.core.constants import MAX_DEPTH_DEFAULT
+from app.models.activity_type import ActivityType
+from app.repositories.organizations_repository import OrganizationsRepository
+from app.repositories.read_model_repository import OrganizationReadModelRepository
+from app.utils.fieldsets import DEFAULT_PAYLOAD_OPTIONS, PayloadOptions
+
+logger = logging.getLogger(__name__)
+
+READ_MODEL_ENABLED = getenv("ORGANIZATION_READ_MODEL", "true").lower() in ("1", "true", "yes")
+
+
+# Деревья деятельностей для всей выборки: из индекса в памяти либо одним запросом к БД.
+# from_db — только из БД: индекс этого процесса может отставать, а такие деревья нельзя сохранять в общий read model
+async def build_activity_trees(
+        session: AsyncSession,
+        activities_by_organization: Mapping[int, Iterable[Union[ActivityType, int]]],
+        max_depth: int = MAX_DEPTH_DEFAULT,
+        from_db: bool = False,
+) -> Dict[int, List[Dict]]:
+    if ACTIVITY_TAXONOMY_INDEX_ENABLED and not from_db:
+        await activity_taxonomy_index.ensure_loaded(session)
+        return activity_taxonomy_index.build_hierarchies(activities_by_organization, max_depth)
+    return await build_activity_hierarchies(session, activities_by_organization, max_depth)
+
+
+# Документ OrganizationRead (или его часть по options.fields) из строки OrganizationsRepository.projection_select()
+def projection_to_dict(row: Row, activities_tree: Optional[List[Dict]],
+                       options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> Dict:
+    document = {"organization_id": row.organization_id}
+    if options.has("name"):
+        document["name"] = row.name
+    if options.has("building"):
+        document["building"] = {
+            "building_id": row.building_id,
+            "address": row.address,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+        }
+    if options.has("phones"):
+        document["phones"] = row.phones
+    if options.has("activities"):
+        document["activities"] = activities_tree
+    return document
+
+
+async def build_organizations_payload(
+        session: AsyncSession,
+        rows: Sequence[Row],
+        options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS,
+        from_db: bool = False,
+) -> List[Dict]:
+    # документы собираются из данных БД и уже соответствуют OrganizationRead — без повторной валидации pydantic
+    trees: Dict[int, List[Dict]] = {}
+    if options.has("activities"):
+        trees = await build_activity_trees(
+            session,
+            {row.organization_id: row.activity_ids for row in rows},
+            max_depth=options.max_depth,
+            from_db=from_db,
+        )
+    return [projection_to_dict(row, trees.get(row.organization_id), options) for row in rows]
+
+
+async def fetch_projections(session: AsyncSession, organization_ids: Sequence[int],
+                            options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> List[Row]:
+    return await OrganizationsRepository.get_projections_by_ids(
+        session,
+        organization_ids,
+        building=options.has("building"),
+        phones=options.has("phones"),
+        activities=options.has("activities"),
+    )
+
+
+# Документы по id в заданном порядке: готовые берутся из organization_read_model,
+# недостающие собираются запросом-проекцией и сохраняются для следующих чтений.
+# Записи в organization_read_model фиксирует вызывающий сервис своим commit
+async def load_organizations_payload(
+        session: AsyncSession,
+        organization_ids: Sequence[int],
+        options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS,
+) -> List[Dict]:
+    # в read model хранятся только полные документы с деревьями глубины по умолчанию;
+    # урезанные по fields/include собираются проекцией без незапрошенных связей
+    use_read_model = READ_MODEL_ENABLED and options.is_full
+
+    documents: Dict[int, Dict] = {}
+    generations: Dict[int, int] = {}
+    if use_read_model:
+        for organization_id, (document, generation) in (
+                await OrganizationReadModelRepository.get_documents(session, organization_ids)
+        ).items():
+            if document is not None:
+                documents[organization_id] = document
+            else:
+                generations[organization_id] = generation
+
+    missing = [organization_id for organization_id in dict.fromkeys(organization_ids)
+               if organization_id not in documents]
+    if missing:
+        rows = await fetch_projections(session, missing, options)
+        # документы, которые уйдут в organization_read_model, строятся целиком из БД в этой же сессии
+        for document in await build_organizations_payload(session, rows, options, from_db=use_read_model):
+            documents[document["organization_id"]] = document
+
+        fresh: List[Tuple[int, int, dict]] = [
+            (organization_id, generations[organization_id], documents[organization_id])
+            for organization_id in missing
+            if organization_id in generations and organization_id in documents
+        ]
+        if fresh:
+            try:
+                # точка сохранения: ошибка записи не откатывает транзакцию сессии вызывающего
+                async with session.begin_nested():
+                    await OrganizationReadModelRepository.store_documents(session, fresh)
+            except SQLAlchemyError:
+                # ответ уже собран, незаписанный документ соберётся при следующем чтении
+                logger.exception("Failed to store organization read model documents")
+
+    return [documents[organization_id] for organization_id in organization_ids if organization_id in documents]
@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import inspect
+import logging
+from collections import Counter
+from os import getenv
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.utils.db import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = getenv("SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+
+T = TypeVar("T")
+
+
+# Одновременные вызовы с одинаковым ключом ждут одно вычисление и получают общий результат (или общую ошибку).
+# Вычисление идёт отдельной задачей: отмена одного из ожидающих (например, клиент оборвал запрос)
+# не отменяет его для остальных
+class SingleFlight:
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._calls: Counter = Counter()
+        self._coalesced: Counter = Counter()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        name = key[0] if isinstance(key, tuple) and key else key
+        self._calls[name] += 1
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._coalesced[name] += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._finish, key))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # все ожидающие могли быть отменены — ошибку всё равно забираем, чтобы не было "never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Coalesced call %r failed: %r", key, task.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        calls = sum(self._calls.values())
+        coalesced = sum(self._coalesced.values())
+        return {
+            "calls": calls,
+            "coalesced": coalesced,
+            "hit_rate": coalesced / calls if calls else 0.0,
+            "in_flight": len(self._in_flight),
+            "by_name": {
+                str(name): {
+                    "calls": count,
+                    "coalesced": self._coalesced[name],
+                    "hit_rate": self._coalesced[name] / count,
+                }
+                for name, count in self._calls.items()
+            },
+        }
+
+
+single_flight = SingleFlight()
+
+
+# Декоратор метода сервиса вида (self, session, ...): ключ — имя + нормализованные аргументы без session.
+# Общее вычисление открывает свою сессию, потому что сессия первого запроса закроется вместе с ним
+def coalesced(name: str):
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(self, session, *args, **kwargs):
+            if not SINGLE_FLIGHT_ENABLED:
+                return await method(self, session, *args, **kwargs)
+
+            bound = signature.bind(self, session, *args, **kwargs)
+            bound.apply_defaults()
+            key = (name,) + tuple(
+                value for argument, value in bound.arguments.items() if argument not in ("self", "session")
+            )
+
+            async def compute():
+                async with async_session_maker() as own_session:
+                    return await method(self, own_session, *args, **kwargs)
+
+            return await single_flight.do(key, compute)
+
+        return wrapper
+
+    return decorator
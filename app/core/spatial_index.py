@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from math import floor
+from os import getenv
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import SPATIAL_GRID_CELL_DEG, SPATIAL_INDEX_MAX_OVERLAY
+from app.core.geo import radius_bboxes, within_radius_with_distances, np
+from app.core.in_memory_index import InMemoryIndex
+from app.models.building import Building
+from app.utils.change_tracking import on_table_change
+from app.utils.db import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+SPATIAL_INDEX_ENABLED = getenv("SPATIAL_INDEX", "true").lower() in ("1", "true", "yes")
+
+
+# Равномерная сетка координат зданий: поиск по радиусу и BBOX без обращений к БД.
+# Координаты лежат в непрерывных массивах, отсортированных по ячейке; ячейка — диапазон [start, end).
+# Изменённые здания перечитываются по id и лежат поверх массивов, пока фоновая перезагрузка не пересоберёт сетку
+class BuildingSpatialIndex(InMemoryIndex):
+    def __init__(self, cell_size: float = SPATIAL_GRID_CELL_DEG):
+        super().__init__()
+        self._cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self._ids: Sequence[int] = []
+        self._lats: Sequence[float] = []
+        self._lons: Sequence[float] = []
+        self._dirty: Set[int] = set()
+        # id -> свежие (lat, lon) изменённых зданий; None — здание удалено или без координат
+        self._overlay: Dict[int, Optional[Tuple[float, float]]] = {}
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_requested = False
+        # id, дочитанные в overlay во время чтения сетки; None — сетка не читается
+        self._refreshed_during_read: Optional[Set[int]] = None
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return floor(lat / self._cell_size), floor(lon / self._cell_size)
+
+    def invalidate(self, key=None) -> None:
+        if not self._loaded:
+            super().invalidate()
+        elif key is None:
+            # неизвестно, что изменилось (TRUNCATE, переподключение слушателя): до перезагрузки отвечает старая сетка
+            self._schedule_reload()
+        else:
+            self._dirty.add(int(key))
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        await super().ensure_loaded(session)
+        if self._dirty:
+            async with self._lock:
+                await self._refresh_dirty(session)
+
+    def _schedule_reload(self) -> None:
+        self._reload_requested = True
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # вне цикла событий фоновую задачу не запустить — перечитаем при следующем запросе
+            super().invalidate()
+            return
+        self._reload_task = loop.create_task(self._reload_in_background(), name="building-spatial-index-reload")
+
+    async def _reload_in_background(self) -> None:
+        while self._reload_requested:
+            self._reload_requested = False
+            try:
+                async with async_session_maker() as session:
+                    grid = await self._read_grid(session)
+                # обмен под замком: дочитывание по id не идёт одновременно с ним и не затирается пустым overlay
+                async with self._lock:
+                    self._install(grid)
+            except Exception:
+                logger.exception("Building spatial index reload failed, reloading on next request")
+                super().invalidate()
+                return
+
+    async def _load(self, session: AsyncSession) -> None:
+        self._install(await self._read_grid(session))
+
+    async def _read_grid(self, session: AsyncSession):
+        # изменения, пришедшие после начала чтения, дочитываются по id; те, что успеют попасть в overlay
+        # до обмена, возвращаются в _dirty, потому что обмен overlay очищает
+        self._dirty = set()
+        self._refreshed_during_read = set()
+        res = await session.execute(select(Building.building_id, Building.latitude, Building.longitude))
+        rows = res.fetchall()
+        # сортировка и массивы на миллион зданий — в отдельном потоке, чтобы не держать цикл событий
+        return await asyncio.to_thread(self._build_grid, rows)
+
+    def _build_grid(self, rows):
+        rows = [
+            (self._cell(lat, lon), int(building_id), lat, lon)
+            for building_id, lat, lon in rows
+            if lat is not None and lon is not None
+        ]
+        rows.sort(key=lambda row: row[0])
+
+        cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for position, (cell, _, _, _) in enumerate(rows):
+            start, _ = cells.get(cell, (position, position))
+            cells[cell] = (start, position + 1)
+
+        ids = [row[1] for row in rows]
+        lats = [row[2] for row in rows]
+        lons = [row[3] for row in rows]
+        if np is not None:
+            ids = np.asarray(ids, dtype=np.int64)
+            lats = np.asarray(lats, dtype=np.float64)
+            lons = np.asarray(lons, dtype=np.float64)
+        return cells, ids, lats, lons
+
+    def _install(self, grid) -> None:
+        self._cells, self._ids, self._lats, self._lons = grid
+        self._overlay = {}
+        self._dirty |= self._refreshed_during_read or set()
+        self._refreshed_during_read = None
+        logger.info("Building spatial index loaded: %d buildings in %d cells", len(self._ids), len(self._cells))
+
+    async def _refresh_dirty(self, session: AsyncSession) -> None:
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        res = await session.execute(
+            select(Building.building_id, Building.latitude, Building.longitude).where(Building.building_id.in_(dirty))
+        )
+        fresh = {
+            int(building_id): (lat, lon)
+            for building_id, lat, lon in res.fetchall()
+            if lat is not None and lon is not None
+        }
+        for building_id in dirty:
+            self._overlay[building_id] = fresh.get(building_id)
+        if self._refreshed_during_read is not None:
+            self._refreshed_during_read |= dirty
+        if len(self._overlay) > SPATIAL_INDEX_MAX_OVERLAY:
+            self._schedule_reload()
+
+    def _candidate_ranges(self, lat_lo: float, lon_lo: float, lat_hi: float, lon_hi: float) -> \
+            List[Tuple[int, int]]:
+        cells = self._cells
+        row_lo, col_lo = self._cell(lat_lo, lon_lo)
+        row_hi, col_hi = self._cell(lat_hi, lon_hi)
+        # для огромных прямоугольников дешевле пройти по занятым ячейкам, чем по всем ячейкам диапазона
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(cells):
+            return sorted(
+                span for key, span in cells.items()
+                if row_lo <= key[0] <= row_hi and col_lo <= key[1] <= col_hi
+            )
+        return [
+            cells[(row, col)]
+            for row in range(row_lo, row_hi + 1)
+            for col in range(col_lo, col_hi + 1)
+            if (row, col) in cells
+        ]
+
+    def _candidates(self, lat_lo: float, lon_lo: float, lat_hi: float, lon_hi: float):
+        ranges = self._candidate_ranges(lat_lo, lon_lo, lat_hi, lon_hi)
+        overlay = self._overlay
+        changed = [
+            (building_id, point) for building_id, point in overlay.items()
+            if point is not None and lat_lo <= point[0] <= lat_hi and lon_lo <= point[1] <= lon_hi
+        ]
+        if np is not None:
+            if ranges:
+                positions = np.concatenate([np.arange(start, end) for start, end in ranges])
+            else:
+                positions = np.empty(0, dtype=np.int64)
+            ids, lats, lons = self._ids[positions], self._lats[positions], self._lons[positions]
+            if overlay:
+                keep = ~np.isin(ids, np.fromiter(overlay, dtype=np.int64, count=len(overlay)))
+                ids = np.concatenate([ids[keep], np.asarray([building_id for building_id, _ in changed], np.int64)])
+                lats = np.concatenate([lats[keep], np.asarray([point[0] for _, point in changed], np.float64)])
+                lons = np.concatenate([lons[keep], np.asarray([point[1] for _, point in changed], np.float64)])
+            return ids, lats, lons
+
+        positions = [
+            position for start, end in ranges for position in range(start, end) if self._ids[position] not in overlay
+        ]
+        return (
+            [self._ids[p] for p in positions] + [building_id for building_id, _ in changed],
+            [self._lats[p] for p in positions] + [point[0] for _, point in changed],
+            [self._lons[p] for p in positions] + [point[1] for _, point in changed],
+        )
+
+    def query_bbox(self, lat_min: float, lon_min: float, lat_max: float, lon_max: float) -> List[int]:
+        lat_lo, lat_hi = min(lat_min, lat_max), max(lat_min, lat_max)
+        lon_lo, lon_hi = min(lon_min, lon_max), max(lon_min, lon_max)
+        ids, lats, lons = self._candidates(lat_lo, lon_lo, lat_hi, lon_hi)
+
+        if np is not None:
+            mask = (lats >= lat_lo) & (lats <= lat_hi) & (lons >= lon_lo) & (lons <= lon_hi)
+            return ids[mask].tolist()
+        return [
+            building_id
+            for building_id, lat, lon in zip(ids, lats, lons)
+            if lat_lo <= lat <= lat_hi and lon_lo <= lon <= lon_hi
+        ]
+
+    def query_radius_with_distances(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        return [
+            item
+            for box in radius_bboxes(lat, lon, radius_km)
+            for item in within_radius_with_distances(lat, lon, radius_km, *self._candidates(*box))
+        ]
+
+
+building_spatial_index = BuildingSpatialIndex()
+
+on_table_change("buildings", building_spatial_index.invalidate)
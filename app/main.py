@@ -2,8 +2,10 @@ import logging
 
 from fastapi import FastAPI
 
+from app.core.single_flight import single_flight
 from app.routes import activities, buildings, organizations
 from app.utils.exception_handler import global_exception_handler
+from app.utils.http_cache import HTTPCacheMiddleware
 from app.utils.migrations import lifespan
 
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +19,9 @@ app = FastAPI(
 )
 
 app.add_exception_handler(Exception, global_exception_handler)
+# кешируется только API справочника (health_check, документация и статистика не зависят от версии данных);
+# потоковая выгрузка не буферизуется и не кешируется
+app.add_middleware(HTTPCacheMiddleware, path_prefix="/api/", exclude_paths={"/api/v1/organizations/export"})
 
 app.include_router(organizations.router, prefix="/api/v1")
 app.include_router(buildings.router, prefix="/api/v1")
@@ -26,3 +31,8 @@ app.include_router(activities.router, prefix="/api/v1")
 @app.get("/health_check")
 async def ping():
     return {"ping": "pong"}
+
+
+@app.get("/stats/single_flight")
+async def single_flight_stats():
+    return single_flight.stats()
@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.organization_activity import organization_activity
@@ -9,6 +9,9 @@ from app.utils.db import Base
 
 class ActivityType(Base):
     __tablename__ = "activity_types"
+    __table_args__ = (
+        Index("ix_activity_types_parent_id", "parent_id"),
+    )
 
     activity_type_id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(nullable=False)
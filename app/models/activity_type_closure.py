@@ -0,0 +1,36 @@
+from sqlalchemy import Table, Column, Integer, ForeignKey, Index
+
+from app.utils.db import Base
+
+# Транзитивное замыкание дерева activity_types (поддерживается триггерами в БД)
+activity_type_closure = Table(
+    "activity_type_closure",
+    Base.metadata,
+    Column(
+        "ancestor_id",
+        Integer,
+        ForeignKey("activity_types.activity_type_id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    ),
+    Column(
+        "descendant_id",
+        Integer,
+        ForeignKey("activity_types.activity_type_id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    ),
+    Column("depth", Integer, nullable=False),
+    Index(
+        "ix_activity_type_closure_descendant_depth",
+        "descendant_id",
+        "depth",
+        postgresql_include=["ancestor_id"],
+    ),
+    Index(
+        "ix_activity_type_closure_ancestor_depth",
+        "ancestor_id",
+        "depth",
+        postgresql_include=["descendant_id"],
+    ),
+)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.utils.db import Base
@@ -5,6 +6,12 @@ from app.utils.db import Base
 
 class Building(Base):
     __tablename__ = "buildings"
+    __table_args__ = (
+        # BBOX-запросы: point(longitude, latitude) <@ box(...)
+        Index("ix_buildings_point", text("point(longitude, latitude)"), postgresql_using="gist"),
+        # сопоставление зданий по адресу при массовом импорте
+        Index("ix_buildings_address", "address", postgresql_using="hash"),
+    )
 
     building_id: Mapped[int] = mapped_column(primary_key=True)
     address: Mapped[str] = mapped_column(nullable=False)
@@ -0,0 +1,11 @@
+from sqlalchemy import Table, Column, Integer, BigInteger
+
+from app.utils.db import Base
+
+# Одна строка со счётчиком версии данных: триггеры увеличивают его при любой записи в таблицы справочника
+data_version = Table(
+    "data_version",
+    Base.metadata,
+    Column("data_version_id", Integer, primary_key=True),
+    Column("version", BigInteger, nullable=False, server_default="0"),
+)
@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.utils.db import Base
@@ -8,9 +9,17 @@ from app.utils.db import Base
 
 class Organization(Base):
     __tablename__ = "organizations"
+    __table_args__ = (
+        Index("ix_organizations_building_id", "building_id", "organization_id"),
+        # триграммный поиск по названию (pg_trgm)
+        Index("ix_organizations_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_organizations_search_document", "search_document", postgresql_using="gin"),
+    )
 
     organization_id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(nullable=False, unique=True)
+    # поддерживается триггерами БД (название + деятельности + адрес), в ORM не загружается
+    search_document: Mapped[Optional[str]] = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
     building_id: Mapped[int] = mapped_column(ForeignKey("buildings.building_id"), nullable=False)
     building: Mapped["Building"] = relationship(back_populates="organizations")
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Integer, ForeignKey, Index
 
 from app.utils.db import Base
 
@@ -19,4 +19,5 @@ organization_activity = Table(
         primary_key=True,
         nullable=False,
     ),
+    Index("ix_organization_activity_activity_type_id", "activity_type_id", "organization_id"),
 )
@@ -0,0 +1,21 @@
+from sqlalchemy import Table, Column, Integer, BigInteger, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.utils.db import Base
+
+# Готовые документы OrganizationRead (глубина дерева по умолчанию).
+# Триггеры в БД сбрасывают document в NULL и увеличивают generation при любом изменении исходных данных,
+# заполняется документ при чтении — только если generation не сдвинулся, пока документ собирался
+organization_read_model = Table(
+    "organization_read_model",
+    Base.metadata,
+    Column(
+        "organization_id",
+        Integer,
+        ForeignKey("organizations.organization_id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    ),
+    Column("document", JSONB, nullable=True),
+    Column("generation", BigInteger, nullable=False, server_default="0"),
+)
@@ -1,10 +1,13 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.utils.db import Base
 
 
 class Phone(Base):
     __tablename__ = "phones"
+    __table_args__ = (
+        Index("ix_phones_organization_id", "organization_id", "phone_id", postgresql_include=["number"]),
+    )
 
     phone_id: Mapped[int] = mapped_column(primary_key=True)
     number: Mapped[str] = mapped_column(nullable=False)
@@ -0,0 +1,22 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.core.constants import BATCH_MAX_IDS
+from app.models.schemas.organization import OrganizationFieldsRead
+
+
+class BatchRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=BATCH_MAX_IDS)
+
+
+class OrganizationBatchItem(BaseModel):
+    organization_id: int
+    found: bool
+    organization: Optional[OrganizationFieldsRead] = None
+
+
+class BuildingOrganizationsBatchItem(BaseModel):
+    building_id: int
+    found: bool
+    organizations: List[OrganizationFieldsRead] = Field(default_factory=list)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -15,3 +15,21 @@ class OrganizationRead(BaseModel):
     activities: List[ActivityTypeRead] = Field(default_factory=list)
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# Ответ маршрутов с параметрами fields / include: кроме organization_id, любое поле может отсутствовать
+class OrganizationFieldsRead(BaseModel):
+    organization_id: int
+    name: Optional[str] = None
+    building: Optional[BuildingRead] = None
+    phones: Optional[List[PhoneRead]] = None
+    activities: Optional[List[ActivityTypeRead]] = None
+
+
+class OrganizationNearestFieldsRead(OrganizationFieldsRead):
+    distance_km: float
+
+
+class OrganizationSuggestion(BaseModel):
+    organization_id: int
+    name: str
@@ -1,11 +1,13 @@
-from typing import List
+from typing import Iterable, List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import select, Select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
+from app.core.constants import MAX_SUBTREE_DEPTH
 from app.models.activity_type import ActivityType
+from app.models.activity_type_closure import activity_type_closure
 from app.models.organization import Organization
+from app.models.organization_activity import organization_activity
 
 
 class ActivitiesRepository:
@@ -14,32 +16,39 @@ class ActivitiesRepository:
         return await session.get(ActivityType, activity_id)
 
     @staticmethod
-    async def get_subtype_ids_bfs(session: AsyncSession, root_id: int) -> List[int]:
-        ids = [root_id]
-        queue = [root_id]
-        while queue:
-            pid = queue.pop()
-            stmt = select(ActivityType.activity_type_id).where(ActivityType.parent_id == pid)
-            res = await session.execute(stmt)
-            children_ids = [row[0] for row in res.fetchall()]
-            for cid in children_ids:
-                if cid not in ids:
-                    ids.append(cid)
-                    queue.append(cid)
-        return ids
+    def subtree_ids_select(root_id: int, max_depth: int = MAX_SUBTREE_DEPTH) -> Select:
+        return select(activity_type_closure.c.descendant_id).where(
+            activity_type_closure.c.ancestor_id == root_id,
+            activity_type_closure.c.depth <= max_depth,
+        )
 
     @staticmethod
-    async def get_organizations_by_activity_ids(session: AsyncSession, activity_ids: List[int]):
-        stmt = (
-            select(Organization)
-            .join(Organization.activities)
-            .where(ActivityType.activity_type_id.in_(activity_ids))
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.phones),
-                selectinload(Organization.activities),
-            )
-            .distinct()
+    async def get_ancestors(session: AsyncSession, activity_ids: Iterable[int], max_depth: int) -> \
+            List[Tuple[int, str, Optional[int]]]:
+        # сами activity_ids и их предки не дальше max_depth уровней
+        ancestor_ids = select(activity_type_closure.c.ancestor_id).where(
+            activity_type_closure.c.descendant_id.in_(list(activity_ids)),
+            activity_type_closure.c.depth <= max_depth,
+        )
+        stmt = select(ActivityType.activity_type_id, ActivityType.name, ActivityType.parent_id).where(
+            ActivityType.activity_type_id.in_(ancestor_ids)
         )
         res = await session.execute(stmt)
+        return res.fetchall()
+
+    @staticmethod
+    def organization_ids_in_subtree_select(root_id: int, max_depth: int = MAX_SUBTREE_DEPTH) -> Select:
+        organization_ids = select(organization_activity.c.organization_id).where(
+            organization_activity.c.activity_type_id.in_(ActivitiesRepository.subtree_ids_select(root_id, max_depth))
+        )
+        return (
+            select(Organization.organization_id)
+            .where(Organization.organization_id.in_(organization_ids))
+            .order_by(Organization.organization_id)
+        )
+
+    @staticmethod
+    async def get_organization_ids_in_subtree(session: AsyncSession, root_id: int,
+                                              max_depth: int = MAX_SUBTREE_DEPTH) -> List[int]:
+        res = await session.execute(ActivitiesRepository.organization_ids_in_subtree_select(root_id, max_depth))
         return res.scalars().all()
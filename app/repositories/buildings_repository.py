@@ -1,5 +1,7 @@
-from typing import Optional
+from typing import List, Optional, Sequence
 
+from sqlalchemy import Integer, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.building import Building
@@ -9,3 +11,14 @@ class BuildingsRepository:
     @staticmethod
     async def get_by_id(session: AsyncSession, building_id: int) -> Optional[Building]:
         return await session.get(Building, building_id)
+
+    @staticmethod
+    async def get_existing_ids(session: AsyncSession, building_ids: Sequence[int]) -> List[int]:
+        if not building_ids:
+            return []
+
+        stmt = select(Building.building_id).where(
+            Building.building_id == any_(bindparam("building_ids", list(building_ids), type_=ARRAY(Integer)))
+        )
+        res = await session.execute(stmt)
+        return res.scalars().all()
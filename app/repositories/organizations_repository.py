@@ -1,142 +1,305 @@
-from math import radians, sin, cos, sqrt, asin
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 
-from sqlalchemy import select, and_
+from sqlalchemy import (
+    select, Select, and_, or_, any_, bindparam, func, literal_column, type_coerce, Integer, JSON, ColumnElement, Row
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.core.constants import EARTH_RADIUS
+from app.core import geo
+from app.core.constants import FULLTEXT_CONFIG
+from app.core.spatial_index import SPATIAL_INDEX_ENABLED, building_spatial_index
 from app.models.building import Building
 from app.models.organization import Organization
+from app.models.organization_activity import organization_activity
+from app.models.phone import Phone
+from app.repositories.activities_repository import ActivitiesRepository
 
 
 class OrganizationsRepository:
 
     @staticmethod
-    def haversine_km(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
-        dlon = radians(lon2 - lon1)
-        dlat = radians(lat2 - lat1)
-        a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-        c = 2 * asin(min(1.0, sqrt(a)))
-        return EARTH_RADIUS * c
+    def keyset(stmt: Select, limit: Optional[int] = None, after_id: Optional[int] = None) -> Select:
+        if after_id is not None:
+            stmt = stmt.where(Organization.organization_id > after_id)
+        stmt = stmt.order_by(Organization.organization_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
 
     @staticmethod
-    async def list_all(session: AsyncSession) -> List[Organization]:
-        stmt = select(Organization).options(
-            selectinload(Organization.building),
-            selectinload(Organization.phones),
-            selectinload(Organization.activities),
-        )
+    async def list_ids(session: AsyncSession, limit: Optional[int] = None, after_id: Optional[int] = None) -> \
+            List[int]:
+        stmt = OrganizationsRepository.keyset(select(Organization.organization_id), limit, after_id)
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return res.scalars().all()
+
+    @staticmethod
+    def projection_select(building: bool = True, phones: bool = True, activities: bool = True) -> Select:
+        # только нужные колонки: телефоны и id деятельностей агрегируются в той же строке, без ORM-объектов;
+        # незапрошенные связи не джойнятся и не агрегируются
+        columns = [Organization.organization_id, Organization.name]
+        if building:
+            columns += [Building.building_id, Building.address, Building.latitude, Building.longitude]
+        if phones:
+            columns.append(type_coerce(OrganizationsRepository._phones_subquery(), JSON).label("phones"))
+        if activities:
+            columns.append(
+                type_coerce(OrganizationsRepository._activity_ids_subquery(), ARRAY(Integer)).label("activity_ids")
+            )
+
+        stmt = select(*columns).select_from(Organization)
+        if building:
+            stmt = stmt.join(Building, Building.building_id == Organization.building_id)
+        return stmt
 
     @staticmethod
-    async def get_by_id(session: AsyncSession, organization_id: int) -> Optional[Organization]:
-        stmt = select(Organization).where(Organization.organization_id == organization_id).options(
-            selectinload(Organization.building),
-            selectinload(Organization.phones),
-            selectinload(Organization.activities),
+    def _phones_subquery() -> ColumnElement:
+        return (
+            select(func.coalesce(
+                func.json_agg(aggregate_order_by(
+                    func.json_build_object("phone_id", Phone.phone_id, "number", Phone.number), Phone.phone_id
+                )),
+                literal_column("'[]'::json"),
+            ))
+            .where(Phone.organization_id == Organization.organization_id)
+            .scalar_subquery()
         )
-        res = await session.execute(stmt)
-        return res.scalars().unique().one_or_none()
 
     @staticmethod
-    async def search_by_name(session: AsyncSession, name: str) -> List[Organization]:
-        stmt = (
-            select(Organization)
-            .where(Organization.name.ilike(f"%{name}%"))
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.phones),
-                selectinload(Organization.activities),
+    def _activity_ids_subquery() -> ColumnElement:
+        return (
+            select(func.coalesce(
+                func.array_agg(organization_activity.c.activity_type_id),
+                literal_column("'{}'::integer[]"),
+            ))
+            .where(organization_activity.c.organization_id == Organization.organization_id)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    async def get_projections_by_ids(session: AsyncSession, organization_ids: Sequence[int],
+                                     building: bool = True, phones: bool = True, activities: bool = True) -> List[Row]:
+        if not organization_ids:
+            return []
+
+        stmt = OrganizationsRepository.projection_select(building, phones, activities).where(
+            Organization.organization_id == any_(
+                bindparam("organization_ids", list(organization_ids), type_=ARRAY(Integer))
             )
         )
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return res.all()
 
     @staticmethod
-    async def get_organisations_in_building(session: AsyncSession, building_id: int) -> List[Organization]:
+    async def stream_projections(session: AsyncSession, chunk_size: int, building: bool = True,
+                                 phones: bool = True, activities: bool = True) -> AsyncIterator[Sequence[Row]]:
+        # серверный курсор: в памяти одновременно только chunk_size строк
         stmt = (
-            select(Organization)
-            .where(Organization.building_id == building_id)
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.phones),
-                selectinload(Organization.activities),
-            )
+            OrganizationsRepository.projection_select(building, phones, activities)
+            .order_by(Organization.organization_id)
+            .execution_options(yield_per=chunk_size)
         )
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+    @staticmethod
+    def ranked(stmt: Select, score: ColumnElement, limit: Optional[int] = None,
+               after: Optional[Tuple[float, int]] = None) -> Select:
+        if after is not None:
+            after_score, after_id = after
+            stmt = stmt.where(or_(
+                score < after_score,
+                and_(score == after_score, Organization.organization_id > after_id),
+            ))
+        stmt = stmt.order_by(score.desc(), Organization.organization_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return stmt
+
+    @staticmethod
+    async def search_by_name(session: AsyncSession, name: str, limit: Optional[int] = None,
+                             after: Optional[Tuple[float, int]] = None) -> List[Tuple[int, float]]:
+        # ILIKE обслуживается GIN-индексом ix_organizations_name_trgm, порядок — по убыванию похожести
+        score = func.similarity(Organization.name, name)
+        stmt = select(Organization.organization_id, score).where(Organization.name.ilike(f"%{name}%"))
+        stmt = OrganizationsRepository.ranked(stmt, score, limit, after)
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return [(row[0], float(row[1])) for row in res.all()]
+
+    @staticmethod
+    def fulltext_match(query: str) -> Tuple[ColumnElement[bool], ColumnElement]:
+        # @@ обслуживается GIN-индексом ix_organizations_search_document
+        ts_query = func.websearch_to_tsquery(FULLTEXT_CONFIG, query)
+        match = Organization.search_document.op("@@", is_comparison=True)(ts_query)
+        return match, func.ts_rank_cd(Organization.search_document, ts_query)
+
+    @staticmethod
+    async def search_fulltext(session: AsyncSession, query: str, limit: Optional[int] = None,
+                              after: Optional[Tuple[float, int]] = None) -> List[Tuple[int, float]]:
+        match, rank = OrganizationsRepository.fulltext_match(query)
+        stmt = select(Organization.organization_id, rank).where(match)
+        stmt = OrganizationsRepository.ranked(stmt, rank, limit, after)
+        res = await session.execute(stmt)
+        return [(row[0], float(row[1])) for row in res.all()]
+
+    @staticmethod
+    def ids_in_building_select(building_id: int) -> Select:
+        return (
+            select(Organization.organization_id)
+            .where(Organization.building_id == building_id)
+            .order_by(Organization.organization_id)
+        )
+
+    @staticmethod
+    async def get_ids_in_building(session: AsyncSession, building_id: int) -> List[int]:
+        res = await session.execute(OrganizationsRepository.ids_in_building_select(building_id))
+        return res.scalars().all()
+
+    @staticmethod
+    def building_in_bbox(lat_lo: float, lon_lo: float, lat_hi: float, lon_hi: float) -> ColumnElement[bool]:
+        # выражение совпадает с GiST-индексом ix_buildings_point: point(longitude, latitude)
+        building_point = func.point(Building.longitude, Building.latitude)
+        area = func.box(func.point(lon_lo, lat_lo), func.point(lon_hi, lat_hi))
+        return building_point.op("<@", is_comparison=True)(area)
+
+    @staticmethod
+    def buildings_in_bboxes_select(boxes: Sequence[Tuple[float, float, float, float]]) -> Select:
+        return select(Building.building_id, Building.latitude, Building.longitude).where(
+            or_(*(OrganizationsRepository.building_in_bbox(*box) for box in boxes))
+        )
 
     @staticmethod
-    async def find_in_bbox(
+    async def find_ids_in_bbox(
             session: AsyncSession,
             lat_min: float,
             lon_min: float,
             lat_max: float,
             lon_max: float,
-    ) -> List[Organization]:
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None,
+    ) -> List[int]:
+        if SPATIAL_INDEX_ENABLED:
+            await building_spatial_index.ensure_loaded(session)
+            building_ids = building_spatial_index.query_bbox(lat_min, lon_min, lat_max, lon_max)
+            return await OrganizationsRepository.get_ids_by_building_ids(session, building_ids, limit, after_id)
+
         lat_lo, lat_hi = min(lat_min, lat_max), max(lat_min, lat_max)
         lon_lo, lon_hi = min(lon_min, lon_max), max(lon_min, lon_max)
 
         stmt = (
-            select(Organization)
+            select(Organization.organization_id)
             .join(Building)
-            .where(
-                and_(
-                    Building.latitude >= lat_lo,
-                    Building.latitude <= lat_hi,
-                    Building.longitude >= lon_lo,
-                    Building.longitude <= lon_hi,
-                )
-            )
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.phones),
-                selectinload(Organization.activities),
-            )
+            .where(OrganizationsRepository.building_in_bbox(lat_lo, lon_lo, lat_hi, lon_hi))
         )
+        stmt = OrganizationsRepository.keyset(stmt, limit, after_id)
         res = await session.execute(stmt)
-        return res.scalars().unique().all()
+        return res.scalars().all()
 
     @staticmethod
-    async def find_in_radius(session: AsyncSession, lat: float, lon: float, radius_km: float) -> List[Organization]:
+    async def find_buildings_in_radius(session: AsyncSession, lat: float, lon: float, radius_km: float) -> \
+            List[Tuple[int, float]]:
+        if SPATIAL_INDEX_ENABLED:
+            await building_spatial_index.ensure_loaded(session)
+            return building_spatial_index.query_radius_with_distances(lat, lon, radius_km)
+
         # BBOX предфильтр (чтобы не просматривать всю таблицу)
-        deg_lat = radius_km / 110.574
-        cos_lat = cos(radians(lat))
-        deg_lon = radius_km / (111.320 * cos_lat) if abs(cos_lat) >= 1e-8 else 180.0
+        b_res = await session.execute(
+            OrganizationsRepository.buildings_in_bboxes_select(geo.radius_bboxes(lat, lon, radius_km))
+        )
+        rows = b_res.fetchall()
+
+        rows = [row for row in rows if row[1] is not None and row[2] is not None]
+        return geo.within_radius_with_distances(
+            lat, lon, radius_km,
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [row[2] for row in rows],
+        )
 
-        lat_min, lat_max = lat - deg_lat, lat + deg_lat
-        lon_min, lon_max = lon - deg_lon, lon + deg_lon
+    @staticmethod
+    async def find_buildings_in_ring(session: AsyncSession, lat: float, lon: float, inner_km: Optional[float],
+                                     outer_km: float) -> List[Tuple[int, float]]:
+        # здания дальше inner_km и не дальше outer_km: при расширении радиуса — только новое кольцо
+        buildings = await OrganizationsRepository.find_buildings_in_radius(session, lat, lon, outer_km)
+        if inner_km is None:
+            return buildings
+        return [(building_id, distance) for building_id, distance in buildings if distance > inner_km]
 
-        b_stmt = select(Building.building_id, Building.latitude, Building.longitude).where(
-            and_(
-                Building.latitude.between(lat_min, lat_max),
-                Building.longitude.between(lon_min, lon_max),
+    @staticmethod
+    def activity_filter(activity_id: int) -> ColumnElement[bool]:
+        return Organization.organization_id.in_(
+            select(organization_activity.c.organization_id).where(
+                organization_activity.c.activity_type_id.in_(ActivitiesRepository.subtree_ids_select(activity_id))
             )
         )
-        b_res = await session.execute(b_stmt)
-        rows = b_res.fetchall()
 
-        building_ids: List[int] = []
-        for row in rows:
-            b_id, b_lat, b_lon = row
-            if b_lat is None or b_lon is None:
-                continue
-            if OrganizationsRepository.haversine_km(lon, lat, b_lon, b_lat) <= radius_km:
-                building_ids.append(b_id)
+    @staticmethod
+    def organization_points_select(activity_id: Optional[int] = None) -> Select:
+        # (organization_id, building_id, latitude, longitude) организаций с координатами здания
+        stmt = (
+            select(Organization.organization_id, Building.building_id, Building.latitude, Building.longitude)
+            .join(Building)
+            .where(Building.latitude.is_not(None), Building.longitude.is_not(None))
+        )
+        if activity_id is not None:
+            stmt = stmt.where(OrganizationsRepository.activity_filter(activity_id))
+        return stmt
+
+    @staticmethod
+    async def count_organization_points(session: AsyncSession, activity_id: Optional[int], limit: int) -> int:
+        # считает не дальше limit: нужен только ответ "больше порога или нет"
+        limited = OrganizationsRepository.organization_points_select(activity_id).limit(limit).subquery()
+        res = await session.execute(select(func.count()).select_from(limited))
+        return res.scalar_one()
+
+    @staticmethod
+    async def list_organization_points(session: AsyncSession, activity_id: Optional[int] = None) -> \
+            List[Tuple[int, int, float, float]]:
+        res = await session.execute(OrganizationsRepository.organization_points_select(activity_id))
+        return [(row[0], row[1], row[2], row[3]) for row in res.fetchall()]
 
+    @staticmethod
+    async def find_building_ids_in_radius(session: AsyncSession, lat: float, lon: float, radius_km: float) -> \
+            List[int]:
+        buildings = await OrganizationsRepository.find_buildings_in_radius(session, lat, lon, radius_km)
+        return [building_id for building_id, _ in buildings]
+
+    @staticmethod
+    async def list_organization_buildings(session: AsyncSession, building_ids: List[int],
+                                          activity_id: Optional[int] = None) -> List[Tuple[int, int]]:
         if not building_ids:
             return []
 
-        org_stmt = (
-            select(Organization)
-            .where(Organization.building_id.in_(building_ids))
-            .options(
-                selectinload(Organization.building),
-                selectinload(Organization.phones),
-                selectinload(Organization.activities),
-            )
+        stmt = select(Organization.organization_id, Organization.building_id).where(
+            Organization.building_id == any_(bindparam("building_ids", building_ids, type_=ARRAY(Integer)))
         )
-        org_res = await session.execute(org_stmt)
-        return org_res.scalars().unique().all()
+        if activity_id is not None:
+            stmt = stmt.where(OrganizationsRepository.activity_filter(activity_id))
+        res = await session.execute(stmt)
+        return [(row[0], row[1]) for row in res.fetchall()]
+
+    @staticmethod
+    async def get_ids_by_building_ids(session: AsyncSession, building_ids: List[int], limit: Optional[int] = None,
+                                      after_id: Optional[int] = None) -> List[int]:
+        if not building_ids:
+            return []
+
+        res = await session.execute(OrganizationsRepository.ids_by_building_ids_select(building_ids, limit, after_id))
+        return res.scalars().all()
+
+    @staticmethod
+    def ids_by_building_ids_select(building_ids: List[int], limit: Optional[int] = None,
+                                   after_id: Optional[int] = None) -> Select:
+        # один параметр-массив вместо IN (...) на тысячи плейсхолдеров
+        stmt = select(Organization.organization_id).where(
+            Organization.building_id == any_(bindparam("building_ids", building_ids, type_=ARRAY(Integer)))
+        )
+        return OrganizationsRepository.keyset(stmt, limit, after_id)
+
+    @staticmethod
+    async def find_ids_in_radius(session: AsyncSession, lat: float, lon: float, radius_km: float,
+                                 limit: Optional[int] = None, after_id: Optional[int] = None) -> List[int]:
+        building_ids = await OrganizationsRepository.find_building_ids_in_radius(session, lat, lon, radius_km)
+        return await OrganizationsRepository.get_ids_by_building_ids(session, building_ids, limit, after_id)
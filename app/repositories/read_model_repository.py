@@ -0,0 +1,44 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, update, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.organization_read_model import organization_read_model
+
+
+class OrganizationReadModelRepository:
+    @staticmethod
+    async def get_documents(session: AsyncSession, organization_ids: Sequence[int]) -> \
+            Dict[int, Tuple[Optional[dict], int]]:
+        if not organization_ids:
+            return {}
+
+        stmt = select(
+            organization_read_model.c.organization_id,
+            organization_read_model.c.document,
+            organization_read_model.c.generation,
+        ).where(organization_read_model.c.organization_id == any_(
+            bindparam("organization_ids", list(organization_ids), type_=ARRAY(Integer))
+        ))
+        res = await session.execute(stmt)
+        return {row[0]: (row[1], row[2]) for row in res.fetchall()}
+
+    @staticmethod
+    async def store_documents(session: AsyncSession, documents: List[Tuple[int, int, dict]]) -> None:
+        if not documents:
+            return
+
+        # строка, generation которой сдвинул триггер, не обновится: документ собран по устаревшим данным
+        stmt = (
+            update(organization_read_model)
+            .where(
+                organization_read_model.c.organization_id == bindparam("b_organization_id"),
+                organization_read_model.c.generation == bindparam("b_generation"),
+            )
+            .values(document=bindparam("b_document"))
+        )
+        await session.execute(stmt, [
+            {"b_organization_id": organization_id, "b_generation": generation, "b_document": document}
+            for organization_id, generation, document in documents
+        ])
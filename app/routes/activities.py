@@ -1,15 +1,24 @@
+from typing import List
+
 from fastapi import APIRouter, Depends, Security
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.models.schemas.organization import OrganizationFieldsRead
 from app.services.activites_service import ActivitiesService
 from app.utils.db import get_session
+from app.utils.fieldsets import PayloadOptions, get_payload_options
 from app.utils.security import get_api_key
+from app.utils.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/activities", tags=["Activities"], dependencies=[Security(get_api_key)])
 
 _activities_service = ActivitiesService()
 
 
-@router.get("/{activity_id}/organizations")
-async def get_organizations_by_activity_id(activity_id: int, session: AsyncSession = Depends(get_session)):
-    return await _activities_service.get_organizations_by_activity_id(session, activity_id)
+@router.get("/{activity_id}/organizations", response_model=List[OrganizationFieldsRead])
+async def get_organizations_by_activity_id(
+        activity_id: int,
+        options: PayloadOptions = Depends(get_payload_options),
+        session: AsyncSession = Depends(get_session)
+):
+    return FastJSONResponse(await _activities_service.get_organizations_by_activity_id(session, activity_id, options))
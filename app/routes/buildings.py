@@ -3,18 +3,33 @@ from typing import List
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.schemas.organization import OrganizationRead
+from app.models.schemas.batch import BatchRequest, BuildingOrganizationsBatchItem
+from app.models.schemas.organization import OrganizationFieldsRead
 from app.services.buildings_service import BuildingsService
 from app.utils.db import get_session
+from app.utils.fieldsets import PayloadOptions, get_payload_options
+from app.utils.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/buildings", tags=["Buildings"])
 
 _building_service = BuildingsService()
 
 
-@router.get("/{building_id}/organizations", response_model=List[OrganizationRead])
+@router.post("/batch", response_model=List[BuildingOrganizationsBatchItem])
+async def organizations_in_buildings_batch(
+        request: BatchRequest,
+        options: PayloadOptions = Depends(get_payload_options),
+        session: AsyncSession = Depends(get_session)
+):
+    return FastJSONResponse(
+        await _building_service.get_organizations_in_buildings_batch(session, request.ids, options)
+    )
+
+
+@router.get("/{building_id}/organizations", response_model=List[OrganizationFieldsRead])
 async def organizations_in_building(
         building_id: int,
+        options: PayloadOptions = Depends(get_payload_options),
         session: AsyncSession = Depends(get_session)
 ):
-    return await _building_service.get_organizations_in_building(session, building_id)
+    return FastJSONResponse(await _building_service.get_organizations_in_building(session, building_id, options))
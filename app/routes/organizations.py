@@ -1,12 +1,20 @@
-from typing import List
+from typing import List, Literal, Optional
 
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.schemas.organization import OrganizationRead
+from app.core.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SUGGEST_LIMIT_DEFAULT, SUGGEST_LIMIT_MAX
+from app.models.schemas.batch import BatchRequest, OrganizationBatchItem
+from app.models.schemas.organization import (
+    OrganizationFieldsRead, OrganizationNearestFieldsRead, OrganizationSuggestion
+)
 from app.services.organizations_service import OrganizationsService
 from app.utils.db import get_session
+from app.utils.fieldsets import PayloadOptions, get_payload_options
+from app.utils.pagination import paginated
 from app.utils.security import get_api_key
+from app.utils.serialization import FastJSONResponse
 
 router = APIRouter(
     prefix="/organizations",
@@ -17,45 +25,116 @@ router = APIRouter(
 _organizations_service = OrganizationsService()
 
 
-@router.get("/", response_model=List[OrganizationRead])
+@router.get("/", response_model=List[OrganizationFieldsRead])
 async def get_all_organizations(
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+        options: PayloadOptions = Depends(get_payload_options),
         session: AsyncSession = Depends(get_session)
 ):
-    return await _organizations_service.get_all_organizations(session)
+    page = await _organizations_service.get_all_organizations(session, limit=limit, cursor=cursor, options=options)
+    return paginated(page)
 
 
-@router.get("/search", response_model=List[OrganizationRead])
+@router.get("/search", response_model=List[OrganizationFieldsRead])
 async def get_organizations_by_name(
         name: str = Query(..., min_length=1),
+        mode: Literal["name", "fulltext"] = Query("name"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+        options: PayloadOptions = Depends(get_payload_options),
+        session: AsyncSession = Depends(get_session)
+):
+    if mode == "fulltext":
+        page = await _organizations_service.search_organizations_fulltext(
+            session, name, limit=limit, cursor=cursor, options=options
+        )
+    else:
+        page = await _organizations_service.get_organization_by_name(
+            session, name, limit=limit, cursor=cursor, options=options
+        )
+    return paginated(page)
+
+
+@router.get("/suggest", response_model=List[OrganizationSuggestion])
+async def suggest_organizations(
+        q: str = Query(..., min_length=1),
+        limit: int = Query(SUGGEST_LIMIT_DEFAULT, ge=1, le=SUGGEST_LIMIT_MAX),
         session: AsyncSession = Depends(get_session)
 ):
-    return await _organizations_service.get_organization_by_name(session, name)
+    return await _organizations_service.suggest_organizations(session, q, limit)
 
 
-@router.get("/near", response_model=List[OrganizationRead])
+@router.get("/near", response_model=List[OrganizationFieldsRead])
 async def get_organizations_near(
         lat: float = Query(..., ge=-90.0, le=90.0),
         lon: float = Query(..., ge=-180.0, le=180.0),
         radius_km: float = Query(..., gt=0.0),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+        options: PayloadOptions = Depends(get_payload_options),
+        session: AsyncSession = Depends(get_session)
+):
+    page = await _organizations_service.find_within_radius(
+        session, lat, lon, radius_km, limit=limit, cursor=cursor, options=options
+    )
+    return paginated(page)
+
+
+@router.get("/nearest", response_model=List[OrganizationNearestFieldsRead])
+async def get_nearest_organizations(
+        lat: float = Query(..., ge=-90.0, le=90.0),
+        lon: float = Query(..., ge=-180.0, le=180.0),
+        k: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+        activity_id: Optional[int] = Query(None),
+        options: PayloadOptions = Depends(get_payload_options),
         session: AsyncSession = Depends(get_session)
 ):
-    return await _organizations_service.find_within_radius(session, lat, lon, radius_km)
+    return FastJSONResponse(
+        await _organizations_service.find_nearest(session, lat, lon, k, activity_id=activity_id, options=options)
+    )
 
 
-@router.get("/within", response_model=List[OrganizationRead])
+@router.get("/within", response_model=List[OrganizationFieldsRead])
 async def get_organizations_within(
         lat_min: float = Query(...),
         lon_min: float = Query(...),
         lat_max: float = Query(...),
         lon_max: float = Query(...),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+        options: PayloadOptions = Depends(get_payload_options),
         session: AsyncSession = Depends(get_session)
 ):
-    return await _organizations_service.get_organizations_within(session, lat_min, lon_min, lat_max, lon_max)
+    page = await _organizations_service.get_organizations_within(
+        session, lat_min, lon_min, lat_max, lon_max, limit=limit, cursor=cursor, options=options
+    )
+    return paginated(page)
+
+
+@router.post("/batch", response_model=List[OrganizationBatchItem])
+async def get_organizations_batch(
+        request: BatchRequest,
+        options: PayloadOptions = Depends(get_payload_options),
+        session: AsyncSession = Depends(get_session)
+):
+    return FastJSONResponse(await _organizations_service.get_organizations_batch(session, request.ids, options))
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_organizations(
+        format: Literal["ndjson"] = Query("ndjson"),
+        options: PayloadOptions = Depends(get_payload_options)
+):
+    return StreamingResponse(
+        _organizations_service.export_organizations(options=options), media_type="application/x-ndjson"
+    )
 
 
-@router.get("/{organization_id}", response_model=OrganizationRead)
+@router.get("/{organization_id}", response_model=OrganizationFieldsRead)
 async def get_organization_by_id(
         organization_id: int,
+        options: PayloadOptions = Depends(get_payload_options),
         session: AsyncSession = Depends(get_session)
 ):
-    return await _organizations_service.get_organization_by_id(session, organization_id)
+    return FastJSONResponse(await _organizations_service.get_organization_by_id(session, organization_id, options))
@@ -1,37 +1,24 @@
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.constants import MAX_DEPTH_DEFAULT
+from app.utils.fieldsets import DEFAULT_PAYLOAD_OPTIONS, PayloadOptions
 from app.repositories.activities_repository import ActivitiesRepository
-from app.core.activity_hierarchy import build_activity_hierarchy
+from app.core.organization_payload import load_organizations_payload
+from app.core.single_flight import coalesced
 
 
 class ActivitiesService:
     def __init__(self, activities_repository: ActivitiesRepository = ActivitiesRepository()):
         self.activities_repository = activities_repository
 
+    @coalesced("activities.organizations")
     async def get_organizations_by_activity_id(self, session: AsyncSession, activity_id: int,
-                                               max_depth: int = MAX_DEPTH_DEFAULT):
+                                               options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS):
         root = await self.activities_repository.get_activity(session, activity_id)
         if not root:
             raise HTTPException(status_code=404, detail="Activity type not found")
 
-        subtype_ids = await self.activities_repository.get_subtype_ids_bfs(session, activity_id)
-        organizations = await self.activities_repository.get_organizations_by_activity_ids(session, subtype_ids)
-
-        results = []
-        for organization in organizations:
-            tree = await build_activity_hierarchy(session, organization.activities, max_depth=max_depth)
-            results.append({
-                "organization_id": organization.organization_id,
-                "name": organization.name,
-                "building": None if not organization.building else {
-                    "building_id": organization.building.building_id,
-                    "address": organization.building.address,
-                    "latitude": organization.building.latitude,
-                    "longitude": organization.building.longitude
-                },
-                "phones": [{"phone_id": p.phone_id, "number": p.number} for p in organization.phones or []],
-                "activities": tree
-            })
-        return results
+        organization_ids = await self.activities_repository.get_organization_ids_in_subtree(session, activity_id)
+        payload = await load_organizations_payload(session, organization_ids, options)
+        await session.commit()
+        return payload
@@ -1,12 +1,11 @@
-from typing import List
+from typing import Dict, List, Sequence
 
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.activity_hierarchy import build_activity_hierarchy
-from app.core.constants import MAX_DEPTH_DEFAULT
-from app.models.organization import Organization
-from app.models.schemas.organization import OrganizationRead
+from app.core.organization_payload import load_organizations_payload
+from app.core.single_flight import coalesced
+from app.utils.fieldsets import DEFAULT_PAYLOAD_OPTIONS, PayloadOptions
 from app.repositories.activities_repository import ActivitiesRepository
 from app.repositories.buildings_repository import BuildingsRepository
 from app.repositories.organizations_repository import OrganizationsRepository
@@ -23,47 +22,52 @@ class BuildingsService:
         self.organizations_repository = organizations_repository
         self.activities_repository = activities_repository
 
+    @coalesced("buildings.organizations")
     async def get_organizations_in_building(
             self,
             session: AsyncSession,
             building_id: int,
-            max_depth: int = MAX_DEPTH_DEFAULT
-    ) -> List[OrganizationRead]:
+            options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS
+    ) -> List[Dict]:
         building = await self.building_repository.get_by_id(session, building_id)
         if not building:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Building not found")
 
-        organizations: List[Organization] = await self.organizations_repository.get_organisations_in_building(
-            session, building_id
-        )
-
-        result: List[OrganizationRead] = []
-        for organization in organizations:
-            assigned = getattr(organization, "activities", None)
-            activities_tree = await build_activity_hierarchy(session, list(assigned), max_depth=max_depth)
+        organization_ids = await self.organizations_repository.get_ids_in_building(session, building_id)
+        payload = await load_organizations_payload(session, organization_ids, options)
+        await session.commit()
+        return payload
 
-            bld = getattr(organization, "building", None)
-            building_payload = None
-            if bld is not None:
-                building_payload = {
-                    "building_id": bld.building_id,
-                    "address": bld.address,
-                    "latitude": bld.latitude,
-                    "longitude": bld.longitude,
-                }
-
-            phones_payload = []
-            for phone in getattr(organization, "phones", []) or []:
-                phones_payload.append({"phone_id": phone.phone_id, "number": phone.number})
+    async def get_organizations_in_buildings_batch(
+            self,
+            session: AsyncSession,
+            building_ids: Sequence[int],
+            options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS
+    ) -> List[Dict]:
+        existing = set(await self.building_repository.get_existing_ids(session, building_ids))
+        organizations_by_building: Dict[int, List[int]] = {building_id: [] for building_id in existing}
+        for organization_id, building_id in sorted(
+                await self.organizations_repository.list_organization_buildings(session, list(existing))
+        ):
+            organizations_by_building[building_id].append(organization_id)
 
-            org_dict = {
-                "organization_id": organization.organization_id,
-                "name": organization.name,
-                "building": building_payload,
-                "phones": phones_payload,
-                "activities": activities_tree,
+        # организации всех зданий собираются одним вызовом
+        payload = await load_organizations_payload(
+            session,
+            [organization_id for ids in organizations_by_building.values() for organization_id in ids],
+            options,
+        )
+        await session.commit()
+        documents = {organization["organization_id"]: organization for organization in payload}
+        return [
+            {
+                "building_id": building_id,
+                "found": building_id in existing,
+                "organizations": [
+                    documents[organization_id]
+                    for organization_id in organizations_by_building.get(building_id, [])
+                    if organization_id in documents
+                ],
             }
-
-            result.append(OrganizationRead(**org_dict))
-
-        return result
+            for building_id in building_ids
+        ]
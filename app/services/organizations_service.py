@@ -1,19 +1,39 @@
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
 from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.activity_hierarchy import build_activity_hierarchy
-from app.core.constants import MAX_DEPTH_DEFAULT
+from app.core.constants import (
+    DEFAULT_PAGE_SIZE,
+    EXPORT_CHUNK_SIZE,
+    NEAREST_DIRECT_CANDIDATES_MAX,
+    NEAREST_INITIAL_RADIUS_KM,
+    MAX_SEARCH_RADIUS_KM,
+    SUGGEST_LIMIT_DEFAULT,
+)
+from app.core import geo
+from app.core.name_index import organization_name_index
+from app.core.organization_payload import build_organizations_payload, load_organizations_payload
+from app.core.single_flight import coalesced
 from app.models.activity_type import ActivityType
-from app.models.schemas.organization import OrganizationRead
+from app.models.schemas.organization import OrganizationSuggestion
+from app.repositories.activities_repository import ActivitiesRepository
 from app.repositories.organizations_repository import OrganizationsRepository
+from app.utils.db import async_session_maker
+from app.utils.pagination import Page, decode_id_cursor, decode_score_cursor, make_page
+from app.utils.fieldsets import DEFAULT_PAYLOAD_OPTIONS, PayloadOptions
+from app.utils.serialization import dumps
 
 
 class OrganizationsService:
-    def __init__(self, organizations_repository: OrganizationsRepository = OrganizationsRepository()):
+    def __init__(
+            self,
+            organizations_repository: OrganizationsRepository = OrganizationsRepository(),
+            activities_repository: ActivitiesRepository = ActivitiesRepository()
+    ):
         self.organizations_repository = organizations_repository
+        self.activities_repository = activities_repository
 
     @staticmethod
     async def _load_activity_objects_by_ids(session, ids):
@@ -22,175 +42,159 @@ class OrganizationsService:
         res = await session.execute(stmt)
         return res.scalars().all()
 
-    async def get_all_organizations(self, session: AsyncSession, max_depth: int = MAX_DEPTH_DEFAULT) -> (
-            List)[OrganizationRead]:
-        orm_list = await self.organizations_repository.list_all(session)
-        result = []
-        for org in orm_list:
-            assigned = getattr(org, "activities", None)
-            activities_tree = await build_activity_hierarchy(session, list(assigned), max_depth=max_depth)
-
-            bld = getattr(org, "building", None)
-            building_payload = None
-            if bld is not None:
-                building_payload = {
-                    "building_id": bld.building_id,
-                    "address": bld.address,
-                    "latitude": bld.latitude,
-                    "longitude": bld.longitude,
-                }
-
-            phones_payload = []
-            for p in getattr(org, "phones", []) or []:
-                phones_payload.append({"phone_id": p.phone_id, "number": p.number})
-
-            org_dict = {
-                "organization_id": org.organization_id,
-                "name": org.name,
-                "building": building_payload,
-                "phones": phones_payload,
-                "activities": activities_tree,
-            }
-
-            result.append(OrganizationRead(**org_dict))
-        return result
-
+    @staticmethod
+    async def _build_page(session: AsyncSession, organization_ids: Sequence[int], limit: int,
+                          options: PayloadOptions) -> Page[Dict]:
+        page = make_page(organization_ids, limit, lambda organization_id: (organization_id,))
+        items = await load_organizations_payload(session, page.items, options)
+        await session.commit()
+        return Page(items, page.next_cursor)
+
+    @coalesced("organizations.list")
+    async def get_all_organizations(self, session: AsyncSession, limit: int = DEFAULT_PAGE_SIZE,
+                                    cursor: Optional[str] = None,
+                                    options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> Page[Dict]:
+        organization_ids = await self.organizations_repository.list_ids(
+            session, limit=limit + 1, after_id=decode_id_cursor(cursor)
+        )
+        return await self._build_page(session, organization_ids, limit, options)
+
+    @coalesced("organizations.by_id")
     async def get_organization_by_id(self, session: AsyncSession, organization_id: int,
-                                     max_depth: int = MAX_DEPTH_DEFAULT) -> OrganizationRead:
-        organization = await self.organizations_repository.get_by_id(session, organization_id)
-        if not organization:
+                                     options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> Dict:
+        payload = await load_organizations_payload(session, [organization_id], options)
+        await session.commit()
+        if not payload:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organization not found")
+        return payload[0]
 
-        assigned = getattr(organization, "activities", None)
-        activities_tree = await build_activity_hierarchy(session, list(assigned), max_depth=max_depth)
-
-        building = getattr(organization, "building", None)
-        building_payload = None
-        if building is not None:
-            building_payload = {
-                "building_id": building.building_id,
-                "address": building.address,
-                "latitude": building.latitude,
-                "longitude": building.longitude,
-            }
-
-        phones_payload = []
-        for p in getattr(organization, "phones", []) or []:
-            phones_payload.append({"phone_id": p.phone_id, "number": p.number})
-
-        org_dict = {
-            "organization_id": organization.organization_id,
-            "name": organization.name,
-            "building": building_payload,
-            "phones": phones_payload,
-            "activities": activities_tree,
-        }
-
-        return OrganizationRead(**org_dict)
-
-    async def get_organization_by_name(self, session: AsyncSession, name: str, max_depth: int = MAX_DEPTH_DEFAULT) -> \
-            List[OrganizationRead]:
-        orm_list = await self.organizations_repository.search_by_name(session, name)
-        out = []
-        for org in orm_list:
-            assigned = getattr(org, "activities", None)
-            activities_tree = await build_activity_hierarchy(session, list(assigned), max_depth=max_depth)
-
-            bld = getattr(org, "building", None)
-            building_payload = None
-            if bld is not None:
-                building_payload = {
-                    "building_id": bld.building_id,
-                    "address": bld.address,
-                    "latitude": bld.latitude,
-                    "longitude": bld.longitude,
-                }
-
-            phones_payload = []
-            for p in getattr(org, "phones", []) or []:
-                phones_payload.append({"phone_id": p.phone_id, "number": p.number})
-
-            org_dict = {
-                "organization_id": org.organization_id,
-                "name": org.name,
-                "building": building_payload,
-                "phones": phones_payload,
-                "activities": activities_tree,
-            }
-
-            out.append(OrganizationRead(**org_dict))
-
-        return out
-
+    @staticmethod
+    async def _build_ranked_page(session: AsyncSession, rows: Sequence[Tuple[int, float]], limit: int,
+                                 options: PayloadOptions) -> Page[Dict]:
+        page = make_page(rows, limit, lambda row: (row[1], row[0]))
+        items = await load_organizations_payload(session, [row[0] for row in page.items], options)
+        await session.commit()
+        return Page(items, page.next_cursor)
+
+    @coalesced("organizations.search")
+    async def get_organization_by_name(self, session: AsyncSession, name: str, limit: int = DEFAULT_PAGE_SIZE,
+                                       cursor: Optional[str] = None,
+                                       options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> Page[Dict]:
+        rows = await self.organizations_repository.search_by_name(
+            session, name, limit=limit + 1, after=decode_score_cursor(cursor)
+        )
+        return await self._build_ranked_page(session, rows, limit, options)
+
+    @coalesced("organizations.fulltext")
+    async def search_organizations_fulltext(self, session: AsyncSession, query: str, limit: int = DEFAULT_PAGE_SIZE,
+                                            cursor: Optional[str] = None,
+                                            options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> Page[Dict]:
+        rows = await self.organizations_repository.search_fulltext(
+            session, query, limit=limit + 1, after=decode_score_cursor(cursor)
+        )
+        return await self._build_ranked_page(session, rows, limit, options)
+
+    async def suggest_organizations(self, session: AsyncSession, query: str,
+                                    limit: int = SUGGEST_LIMIT_DEFAULT) -> List[OrganizationSuggestion]:
+        await organization_name_index.ensure_loaded(session)
+        return [
+            OrganizationSuggestion(organization_id=organization_id, name=name)
+            for organization_id, name in organization_name_index.suggest(query, limit)
+        ]
+
+    @coalesced("organizations.near")
     async def find_within_radius(self, session: AsyncSession, lat: float, lon: float, radius_km: float,
-                                 max_depth: int = MAX_DEPTH_DEFAULT) -> List[OrganizationRead]:
-        organizations_list = await self.organizations_repository.find_in_radius(session, lat, lon, radius_km)
-        result = []
-        for organization in organizations_list:
-            assigned = getattr(organization, "activities", None)
-            activities_tree = await build_activity_hierarchy(session, list(assigned), max_depth=max_depth)
-
-            building = getattr(organization, "building", None)
-
-            building_payload = None
-
-            if building is not None:
-                building_payload = {
-                    "building_id": building.building_id,
-                    "address": building.address,
-                    "latitude": building.latitude,
-                    "longitude": building.longitude,
-                }
-
-            phones_payload = []
-            for p in getattr(organization, "phones", []) or []:
-                phones_payload.append({"phone_id": p.phone_id, "number": p.number})
-
-            org_dict = {
-                "organization_id": organization.organization_id,
-                "name": organization.name,
-                "building": building_payload,
-                "phones": phones_payload,
-                "activities": activities_tree,
-            }
-
-            result.append(OrganizationRead(**org_dict))
-        return result
-
+                                 limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                 options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> Page[Dict]:
+        organization_ids = await self.organizations_repository.find_ids_in_radius(
+            session, lat, lon, radius_km, limit=limit + 1, after_id=decode_id_cursor(cursor)
+        )
+        return await self._build_page(session, organization_ids, limit, options)
+
+    @coalesced("organizations.within")
     async def get_organizations_within(self, session: AsyncSession, lat_min: float, lon_min: float, lat_max: float,
-                                       lon_max: float,
-                                       max_depth: int = MAX_DEPTH_DEFAULT) -> List[OrganizationRead]:
-        organizations_list = await self.organizations_repository.find_in_bbox(session, lat_min, lon_min, lat_max,
-                                                                              lon_max)
-        result = []
-        for org in organizations_list:
-            assigned = getattr(org, "activities", None)
-            activities_tree = await build_activity_hierarchy(session, list(assigned), max_depth=max_depth)
-
-            building = getattr(org, "building", None)
-
-            building_payload = None
-
-            if building is not None:
-                building_payload = {
-                    "building_id": building.building_id,
-                    "address": building.address,
-                    "latitude": building.latitude,
-                    "longitude": building.longitude,
-                }
-
-            phones_payload = []
-            for phones in getattr(org, "phones", []) or []:
-                phones_payload.append({"phone_id": phones.phone_id, "number": phones.number})
-
-            organization_dict = {
-                "organization_id": org.organization_id,
-                "name": org.name,
-                "building": building_payload,
-                "phones": phones_payload,
-                "activities": activities_tree,
+                                       lon_max: float, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                                       options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> Page[Dict]:
+        organization_ids = await self.organizations_repository.find_ids_in_bbox(
+            session, lat_min, lon_min, lat_max, lon_max, limit=limit + 1, after_id=decode_id_cursor(cursor)
+        )
+        return await self._build_page(session, organization_ids, limit, options)
+
+    @coalesced("organizations.nearest")
+    async def find_nearest(self, session: AsyncSession, lat: float, lon: float, k: int,
+                           activity_id: Optional[int] = None,
+                           options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> List[Dict]:
+        if activity_id is not None and not await self.activities_repository.get_activity(session, activity_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity type not found")
+
+        # подходящих организаций немного (редкая деятельность, маленький справочник) — считаем расстояния до всех,
+        # а не расширяем радиус до всей планеты
+        located = await self.organizations_repository.count_organization_points(
+            session, activity_id, NEAREST_DIRECT_CANDIDATES_MAX + 1
+        )
+        if located <= NEAREST_DIRECT_CANDIDATES_MAX:
+            points = await self.organizations_repository.list_organization_points(session, activity_id)
+            distances = {
+                building_id: float(distance)
+                for (_, building_id, _, _), distance in zip(points, geo.haversine_km_many(
+                    lon, lat, [point[3] for point in points], [point[2] for point in points]
+                ))
             }
-
-            result.append(OrganizationRead(**organization_dict))
-
-        return result
+            candidates = [(organization_id, building_id) for organization_id, building_id, _, _ in points]
+        else:
+            # расширяем радиус, пока внутри не окажется k организаций: ближайшие k гарантированно внутри круга.
+            # На каждом шаге организации ищутся только в зданиях нового кольца
+            distances = {}
+            candidates = []
+            inner_km, radius_km = None, NEAREST_INITIAL_RADIUS_KM
+            while True:
+                ring = await self.organizations_repository.find_buildings_in_ring(
+                    session, lat, lon, inner_km, radius_km
+                )
+                distances.update(ring)
+                candidates += await self.organizations_repository.list_organization_buildings(
+                    session, [building_id for building_id, _ in ring], activity_id
+                )
+                if len(candidates) >= k or radius_km >= MAX_SEARCH_RADIUS_KM:
+                    break
+                inner_km, radius_km = radius_km, min(radius_km * 2, MAX_SEARCH_RADIUS_KM)
+
+        nearest = sorted(candidates, key=lambda item: (distances[item[1]], item[0]))[:k]
+        building_of = dict(nearest)
+        payload = await load_organizations_payload(
+            session, [organization_id for organization_id, _ in nearest], options
+        )
+        await session.commit()
+        return [
+            {**organization, "distance_km": distances[building_of[organization["organization_id"]]]}
+            for organization in payload
+        ]
+
+    # один запрос-проекция на все id вместо запроса на каждый; порядок и повторы id сохраняются
+    async def get_organizations_batch(self, session: AsyncSession, organization_ids: Sequence[int],
+                                      options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> List[Dict]:
+        payload = await load_organizations_payload(session, organization_ids, options)
+        await session.commit()
+        documents = {organization["organization_id"]: organization for organization in payload}
+        return [
+            {
+                "organization_id": organization_id,
+                "found": organization_id in documents,
+                "organization": documents.get(organization_id),
+            }
+            for organization_id in organization_ids
+        ]
+
+    async def export_organizations(self, chunk_size: int = EXPORT_CHUNK_SIZE,
+                                   options: PayloadOptions = DEFAULT_PAYLOAD_OPTIONS) -> AsyncIterator[bytes]:
+        # отдаётся через StreamingResponse уже после выхода из зависимостей, поэтому сессия своя
+        async with async_session_maker() as session:
+            async for chunk in self.organizations_repository.stream_projections(
+                    session,
+                    chunk_size,
+                    building=options.has("building"),
+                    phones=options.has("phones"),
+                    activities=options.has("activities"),
+            ):
+                payload = await build_organizations_payload(session, chunk, options)
+                yield b"".join(dumps(organization) + b"\n" for organization in payload)
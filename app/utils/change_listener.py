@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+from os import getenv
+from typing import Optional
+
+import asyncpg
+
+from app.utils.change_tracking import notify_all_tables_changed, notify_table_change
+from app.utils.db import ASYNCPG_DSN
+
+logger = logging.getLogger(__name__)
+
+CHANGE_NOTIFICATIONS_ENABLED = getenv("CHANGE_NOTIFICATIONS", "true").lower() in ("1", "true", "yes")
+
+CHANGE_CHANNEL = "table_changes"
+RECONNECT_DELAY_MIN = 1.0
+RECONNECT_DELAY_MAX = 30.0
+HEALTH_CHECK_INTERVAL = 30.0
+CONNECT_TIMEOUT = 5.0
+
+
+# Фоновый LISTEN на канал уведомлений об изменениях (триггеры notify_table_change в БД).
+# Каждое уведомление передаётся в notify_table_change, как и изменения, закоммиченные в этом процессе.
+# После (пере)подключения все кеши сбрасываются целиком: уведомления, пришедшие без слушателя, потеряны
+class ChangeListener:
+    def __init__(self, dsn: str, channel: str = CHANGE_CHANNEL):
+        self._dsn = dsn
+        self._channel = channel
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def start(self, wait_timeout: float = CONNECT_TIMEOUT) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="change-listener")
+        try:
+            await asyncio.wait_for(self._connected.wait(), wait_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Change listener is not connected yet, continuing in background")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            table_name = message["table"]
+            key = message.get("key")
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Malformed change notification: %r", payload)
+            return
+        notify_table_change(table_name, int(key) if key is not None else None)
+
+    async def _run(self) -> None:
+        delay = RECONNECT_DELAY_MIN
+        while True:
+            try:
+                connection = await asyncpg.connect(self._dsn, timeout=CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+                logger.exception("Change listener failed to connect, retrying in %.0fs", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+                continue
+
+            terminated = asyncio.Event()
+            connection.add_termination_listener(lambda _: terminated.set())
+            try:
+                await connection.add_listener(self._channel, self._on_notification)
+                notify_all_tables_changed()
+                self._connected.set()
+                delay = RECONNECT_DELAY_MIN
+                logger.info("Change listener subscribed to %s", self._channel)
+
+                while not terminated.is_set():
+                    try:
+                        await asyncio.wait_for(terminated.wait(), HEALTH_CHECK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # молча оборванное соединение само не закроется — проверяем его запросом
+                        await connection.execute("SELECT 1", timeout=CONNECT_TIMEOUT)
+                logger.warning("Change listener connection closed, reconnecting")
+            except Exception:
+                logger.exception("Change listener connection lost, reconnecting")
+            finally:
+                self._connected.clear()
+                if not connection.is_closed():
+                    connection.terminate()
+
+            await asyncio.sleep(delay)
+
+
+change_listener = ChangeListener(ASYNCPG_DSN)
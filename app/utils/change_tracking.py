@@ -0,0 +1,59 @@
+import logging
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ChangeCallback = Callable[[Optional[int]], None]
+
+# Таблицы справочника, от которых зависят кеши в памяти процесса
+REFERENCE_TABLES = ("organizations", "buildings", "phones", "activity_types", "organization_activity")
+
+_callbacks: Dict[str, List[ChangeCallback]] = {}
+
+
+# Подписка на изменения таблицы; key — первичный ключ изменённой строки (None — неизвестно какой)
+def on_table_change(table_name: str, callback: ChangeCallback) -> None:
+    _callbacks.setdefault(table_name, []).append(callback)
+
+
+def notify_table_change(table_name: str, key: Optional[int] = None) -> None:
+    for callback in _callbacks.get(table_name, []):
+        try:
+            callback(key)
+        except Exception:
+            logger.exception("Change callback failed for table %s", table_name)
+
+
+def notify_all_tables_changed() -> None:
+    for table_name in REFERENCE_TABLES:
+        notify_table_change(table_name)
+
+
+def _row_key(obj) -> Optional[int]:
+    state = inspect(obj)
+    pk = state.mapper.primary_key_from_instance(obj)
+    return pk[0] if len(pk) == 1 else None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    changes: Set[Tuple[str, Optional[int]]] = session.info.setdefault("table_changes", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            changes.add((table.name, _row_key(obj)))
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_on_commit(session: Session) -> None:
+    for table_name, key in session.info.pop("table_changes", set()):
+        notify_table_change(table_name, key)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _reset_changes(session: Session, previous_transaction) -> None:
+    session.info.pop("table_changes", None)
@@ -14,6 +14,8 @@ PG_PASSWORD = os.getenv("PG_PASSWORD", "postgres")
 PG_DB = os.getenv("PG_DB", "mydb")
 
 DATABASE_URL = f"postgresql+asyncpg://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}"
+# для прямых подключений asyncpg в обход SQLAlchemy (LISTEN, COPY)
+ASYNCPG_DSN = f"postgresql://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DB}"
 
 engine = create_async_engine(DATABASE_URL, echo=True)
 
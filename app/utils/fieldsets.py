@@ -0,0 +1,61 @@
+from typing import FrozenSet, NamedTuple, Optional
+
+from fastapi import HTTPException, Query, status
+
+from app.core.constants import MAX_DEPTH_DEFAULT, MAX_SUBTREE_DEPTH
+
+ORGANIZATION_FIELDS = ("organization_id", "name", "building", "phones", "activities")
+ORGANIZATION_RELATIONS = ("building", "phones", "activities")
+
+
+# Какие поля организации собирать и до какой глубины строить дерево деятельностей.
+# Хешируется: входит в ключ склейки одинаковых запросов
+class PayloadOptions(NamedTuple):
+    fields: FrozenSet[str] = frozenset(ORGANIZATION_FIELDS)
+    max_depth: int = MAX_DEPTH_DEFAULT
+
+    @property
+    def is_full(self) -> bool:
+        return self.fields == DEFAULT_PAYLOAD_OPTIONS.fields and self.max_depth == MAX_DEPTH_DEFAULT
+
+    def has(self, field: str) -> bool:
+        return field in self.fields
+
+
+DEFAULT_PAYLOAD_OPTIONS = PayloadOptions()
+
+
+def _parse_names(value: Optional[str], allowed: tuple, parameter: str, allow_empty: bool = True) -> \
+        Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+    if not names and not allow_empty:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Empty {parameter}. Allowed: {', '.join(allowed)}"
+        )
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {parameter}: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+        )
+    return names
+
+
+# fields — возвращаемые поля верхнего уровня, include — связи (здание, телефоны, деятельности);
+# связь попадает в ответ, только если разрешена обоими параметрами. organization_id возвращается всегда.
+# Пустой fields — ошибка (иначе он молча означал бы все поля), пустой include — ответ без связей
+async def get_payload_options(
+        fields: Optional[str] = Query(None, description="Поля через запятую: " + ",".join(ORGANIZATION_FIELDS)),
+        include: Optional[str] = Query(None, description="Связи через запятую: " + ",".join(ORGANIZATION_RELATIONS)),
+        max_depth: int = Query(MAX_DEPTH_DEFAULT, ge=1, le=MAX_SUBTREE_DEPTH),
+) -> PayloadOptions:
+    selected = _parse_names(fields, ORGANIZATION_FIELDS, "fields", allow_empty=False)
+    selected = set(ORGANIZATION_FIELDS if selected is None else selected)
+    included = _parse_names(include, ORGANIZATION_RELATIONS, "include")
+    if included is not None:
+        selected -= set(ORGANIZATION_RELATIONS) - included
+    selected.add("organization_id")
+    return PayloadOptions(frozenset(selected), max_depth)
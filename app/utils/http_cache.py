@@ -0,0 +1,181 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from os import getenv
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.data_version import data_version
+from app.utils.change_tracking import REFERENCE_TABLES, on_table_change
+from app.utils.db import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_ENABLED = getenv("HTTP_CACHE", "true").lower() in ("1", "true", "yes")
+HTTP_CACHE_SIZE = int(getenv("HTTP_CACHE_SIZE", "1024"))
+HTTP_CACHE_MAX_AGE = int(getenv("HTTP_CACHE_MAX_AGE", "0"))
+# тела крупнее не кладём в LRU, но ETag и 304 для них работают
+HTTP_CACHE_MAX_BODY = int(getenv("HTTP_CACHE_MAX_BODY", str(1024 * 1024)))
+# суммарный размер тел в LRU: число записей само по себе память не ограничивает
+HTTP_CACHE_MAX_BYTES = int(getenv("HTTP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+# Кеш GET-ответов поверх версии данных: ETag = версия + запрос, поэтому 304 отдаётся без обращения к БД,
+# а тела горячих запросов текущей версии отдаются из LRU.
+# Индексы в памяти обновляются уведомлениями отдельно от версии, поэтому ответ, во время которого пришли изменения,
+# не кешируется, а каждое уведомление очищает LRU: версия могла быть прочитана из БД раньше, чем дошло уведомление
+class HTTPCacheMiddleware:
+    def __init__(self, app: ASGIApp, path_prefix: str = "/", exclude_paths: Iterable[str] = (),
+                 max_entries: int = HTTP_CACHE_SIZE, max_age: int = HTTP_CACHE_MAX_AGE,
+                 max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.exclude_paths = set(exclude_paths)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self.cache_control = f"private, max-age={max_age}, must-revalidate"
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        for table in REFERENCE_TABLES:
+            on_table_change(table, self.clear)
+
+    def clear(self, key=None) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    @staticmethod
+    def cache_key(scope: Scope) -> str:
+        headers = Headers(scope=scope)
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)))
+        # ответ зависит от ключа доступа (403 не кешируется), сам ключ в памяти не храним
+        api_key = hashlib.sha256(headers.get("x-api-key", "").encode()).hexdigest()
+        return f"{scope['path']}?{query}#{api_key}"
+
+    @staticmethod
+    def make_etag(version: int, key: str) -> str:
+        return f'"{version}-{hashlib.sha256(key.encode()).hexdigest()[:24]}"'
+
+    # "*" совпадает, только когда известно, что представление есть и доступ к нему уже проверен
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: str, allow_any: bool) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        return etag in candidates or (allow_any and "*" in candidates)
+
+    @staticmethod
+    async def current_version() -> int:
+        if not data_version.is_fresh:
+            async with async_session_maker() as session:
+                await data_version.ensure_loaded(session)
+        return data_version.value
+
+    def _cache_headers(self, etag: str) -> List[Tuple[bytes, bytes]]:
+        return [
+            (b"etag", etag.encode()),
+            (b"cache-control", self.cache_control.encode()),
+            (b"vary", b"X-API-Key"),
+        ]
+
+    def _store(self, key: str, entry: CachedResponse) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous.body)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (not HTTP_CACHE_ENABLED or scope["type"] != "http" or scope["method"] != "GET"
+                or not scope["path"].startswith(self.path_prefix) or scope["path"] in self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        generation = data_version.generation
+        try:
+            version = await self.current_version()
+        except Exception:
+            logger.exception("Failed to load data version, serving without HTTP cache")
+            await self.app(scope, receive, send)
+            return
+
+        key = self.cache_key(scope)
+        etag = self.make_etag(version, key)
+        if_none_match = Headers(scope=scope).get("if-none-match")
+
+        # запись есть только у ответа 200, который приложение уже отдало с этим же ключом доступа (он входит в key),
+        # поэтому без неё 304 и тело из LRU не отдаются: сначала отрабатывает приложение вместе с проверкой ключа
+        entry = self._entries.get(key)
+        if entry is not None and entry.etag == etag:
+            self._entries.move_to_end(key)
+            if self.etag_matches(if_none_match, etag, allow_any=True):
+                await self._send_not_modified(send, etag)
+                return
+            await send({"type": "http.response.start", "status": 200, "headers": entry.headers})
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+        await self._call_and_cache(scope, receive, send, key, version, generation, if_none_match)
+
+    async def _send_not_modified(self, send: Send, etag: str) -> None:
+        await send({"type": "http.response.start", "status": 304, "headers": self._cache_headers(etag)})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _call_and_cache(self, scope: Scope, receive: Receive, send: Send, key: str, version: int,
+                              generation: int, if_none_match: Optional[str]) -> None:
+        etag = self.make_etag(version, key)
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        cacheable = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, cacheable
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                cacheable = message["status"] == 200 and headers.get("content-type", "").startswith(
+                    "application/json"
+                )
+                if not cacheable:
+                    await send(message)
+                    return
+                for name, value in self._cache_headers(etag):
+                    headers[name.decode()] = value.decode()
+                start = message
+                return
+
+            if not cacheable:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            if data_version.generation != generation or data_version.value != version:
+                # пока строился ответ, данные менялись: тело могло собраться из индексов другой версии
+                del MutableHeaders(scope=start)["etag"]
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            if len(body) <= HTTP_CACHE_MAX_BODY:
+                self._store(key, CachedResponse(etag, list(start["headers"]), body))
+            # приложение ответило 200 — доступ проверен, ресурс существует
+            if self.etag_matches(if_none_match, etag, allow_any=True):
+                await self._send_not_modified(send, etag)
+                return
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -3,7 +3,11 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from app.core.activity_taxonomy_index import ACTIVITY_TAXONOMY_INDEX_ENABLED, activity_taxonomy_index
+from app.core.name_index import organization_name_index
+from app.core.spatial_index import SPATIAL_INDEX_ENABLED, building_spatial_index
 from app.initial_data import ensure_test_data
+from app.utils.change_listener import CHANGE_NOTIFICATIONS_ENABLED, change_listener
 from app.utils.db import async_session_maker
 
 
@@ -18,8 +22,27 @@ async def lifespan(app: FastAPI):
     except Exception:
         logging.exception("Error during startup (seeding test data)")
 
+    # слушатель поднимается до загрузки индексов, чтобы не пропустить изменения между загрузкой и подпиской
+    if CHANGE_NOTIFICATIONS_ENABLED:
+        await change_listener.start()
+
+    indexes = [
+        (ACTIVITY_TAXONOMY_INDEX_ENABLED, "activity taxonomy index", activity_taxonomy_index),
+        (SPATIAL_INDEX_ENABLED, "building spatial index", building_spatial_index),
+        (True, "organization name index", organization_name_index),
+    ]
+    for enabled, title, index in indexes:
+        if not enabled:
+            continue
+        try:
+            async with async_session_maker() as session:
+                await index.ensure_loaded(session)
+        except Exception:
+            logging.exception("Error during startup (loading %s)", title)
+
     # Пропускаем управление в приложение
     yield
 
     logging.info("LIFESPAN shutdown: cleaning up if necessary")
+    await change_listener.stop()
     logging.info("LIFESPAN shutdown: done")
@@ -0,0 +1,65 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Generic, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException, status
+
+from app.utils.serialization import FastJSONResponse
+
+T = TypeVar("T")
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(NamedTuple, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str]
+
+
+# Курсор непрозрачен для клиента: base64 от json-списка значений ключа сортировки
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], *types: type) -> Optional[List[Any]]:
+    if cursor is None:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        values = None
+    if (
+            not isinstance(values, list)
+            or len(values) != len(types)
+            # bool — подкласс int, в курсоре его быть не может
+            or any(isinstance(value, bool) or not isinstance(value, expected) for value, expected in zip(values, types))
+    ):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    values = decode_cursor(cursor, int)
+    return values[0] if values is not None else None
+
+
+def decode_score_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    values = decode_cursor(cursor, (int, float), int)
+    return (float(values[0]), values[1]) if values is not None else None
+
+
+# rows запрошены с limit + 1: лишняя строка означает, что есть следующая страница
+def make_page(rows: Sequence[Any], limit: int, cursor_values: Callable[[Any], Sequence[Any]]) -> Page:
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(*cursor_values(items[-1]))
+    return Page(items, next_cursor)
+
+
+def paginated(page: Page) -> FastJSONResponse:
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor is not None else None
+    return FastJSONResponse(page.items, headers=headers)
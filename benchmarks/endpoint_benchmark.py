@@ -0,0 +1,299 @@
+# Нагрузочный прогон всех маршрутов с организациями: задержки p50/p95/p99, пропускная способность,
+# запросы к БД на HTTP-запрос и пиковый RSS, сравнение с сохранённым базовым прогоном.
+# Нужна локальная Postgres с данными (python -m benchmarks.generate_dataset); запускать на нескольких объёмах —
+# результаты в файле базового прогона хранятся по числу организаций.
+# Приложение вызывается в том же процессе через ASGI, без сети: измеряется само приложение и БД.
+# HTTP-кеш по умолчанию выключен, иначе повторы отдаются из LRU без сервисов и БД; с --http-cache
+# прогон с кешем сохраняется в базовом файле отдельно.
+# Запуск: python -m benchmarks.endpoint_benchmark [--requests 500] [--concurrency 16] [--http-cache]
+#         [--save-baseline baseline.json | --baseline baseline.json]
+import argparse
+import asyncio
+import json
+import logging
+import random
+import resource
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import event, text
+
+from app.main import app
+from app.utils import http_cache
+from app.utils.db import async_session_maker, engine
+from app.utils.pagination import encode_cursor
+from app.utils.security import API_KEY
+
+PREFIX = "/api/v1"
+SAMPLE_SIZE = 1_000
+WARMUP_REQUESTS = 20
+BATCH_SIZE = 100
+# допустимое ухудшение относительно базового прогона
+DEFAULT_TOLERANCE = 0.15
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    body: bytes = b""
+
+
+class Samples(NamedTuple):
+    organization_ids: List[int]
+    building_ids: List[int]
+    activity_ids: List[int]
+    points: List[Tuple[float, float]]
+    words: List[str]
+
+
+class Scenario(NamedTuple):
+    name: str
+    make_request: Callable[[random.Random, Samples], Request]
+
+
+def get(path: str, **params) -> Request:
+    return Request("GET", f"{PREFIX}{path}?{urlencode(params)}" if params else f"{PREFIX}{path}")
+
+
+SCENARIOS: List[Scenario] = [
+    # страница с произвольного места: одинаковые запросы склеились бы и не нагружали БД
+    Scenario("list", lambda rng, s: get(
+        "/organizations/", limit=100, cursor=encode_cursor(rng.choice(s.organization_ids))
+    )),
+    Scenario("search", lambda rng, s: get("/organizations/search", name=rng.choice(s.words), limit=50)),
+    Scenario("search_fulltext", lambda rng, s: get(
+        "/organizations/search", name=rng.choice(s.words), mode="fulltext", limit=50
+    )),
+    Scenario("suggest", lambda rng, s: get("/organizations/suggest", q=rng.choice(s.words)[:3])),
+    Scenario("near", lambda rng, s: around(rng, s, "/organizations/near", radius_km=1, limit=100)),
+    Scenario("nearest", lambda rng, s: around(rng, s, "/organizations/nearest", k=20)),
+    Scenario("within", lambda rng, s: within(rng, s)),
+    Scenario("by_id", lambda rng, s: get(f"/organizations/{rng.choice(s.organization_ids)}")),
+    Scenario("batch", lambda rng, s: batch(rng, s)),
+    Scenario("building", lambda rng, s: get(f"/buildings/{rng.choice(s.building_ids)}/organizations")),
+    Scenario("activity", lambda rng, s: get(f"/activities/{rng.choice(s.activity_ids)}/organizations")),
+]
+
+
+# точки берутся у существующих зданий, чтобы гео-запросы не уходили в пустые районы
+def around(rng: random.Random, samples: Samples, path: str, **params) -> Request:
+    lat, lon = rng.choice(samples.points)
+    return get(path, lat=lat, lon=lon, **params)
+
+
+def within(rng: random.Random, samples: Samples) -> Request:
+    lat, lon = rng.choice(samples.points)
+    return get("/organizations/within", lat_min=lat - 0.01, lon_min=lon - 0.02, lat_max=lat + 0.01,
+               lon_max=lon + 0.02, limit=100)
+
+
+def batch(rng: random.Random, samples: Samples) -> Request:
+    ids = rng.sample(samples.organization_ids, min(BATCH_SIZE, len(samples.organization_ids)))
+    return Request("POST", f"{PREFIX}/organizations/batch", json.dumps({"ids": ids}).encode())
+
+
+async def load_samples(rng: random.Random) -> Samples:
+    async with async_session_maker() as session:
+        async def column(sql: str) -> List:
+            res = await session.execute(text(sql), {"limit": SAMPLE_SIZE})
+            return [row[0] if len(row) == 1 else tuple(row) for row in res.fetchall()]
+
+        # TABLESAMPLE был бы быстрее, но на маленьких таблицах часто возвращает пустоту
+        organization_ids = await column("SELECT organization_id FROM organizations ORDER BY random() LIMIT :limit")
+        building_ids = await column("SELECT building_id FROM buildings ORDER BY random() LIMIT :limit")
+        activity_ids = await column("SELECT activity_type_id FROM activity_types ORDER BY random() LIMIT :limit")
+        points = await column("SELECT latitude, longitude FROM buildings ORDER BY random() LIMIT :limit")
+        names = await column("SELECT name FROM organizations ORDER BY random() LIMIT :limit")
+
+    words = sorted({word.strip('"«»') for name in names for word in name.split() if len(word.strip('"«»')) >= 4})
+    if not organization_ids or not building_ids or not activity_ids or not words:
+        raise RuntimeError("The database is empty: load data with python -m benchmarks.generate_dataset first")
+    rng.shuffle(words)
+    return Samples(organization_ids, building_ids, activity_ids, points, words)
+
+
+async def count_rows() -> int:
+    async with async_session_maker() as session:
+        return (await session.execute(text("SELECT count(*) FROM organizations"))).scalar_one()
+
+
+# Минимальный ASGI-клиент: HTTP-клиента среди зависимостей нет, а сеть в замер не нужна
+async def call(request: Request) -> int:
+    headers = [(b"x-api-key", (API_KEY or "").encode())]
+    if request.body:
+        headers.append((b"content-type", b"application/json"))
+    path, _, query = request.path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": request.method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": headers, "server": ("benchmark", 80), "client": ("benchmark", 0), "app": app,
+    }
+    received = False
+    status = 0
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": request.body, "more_body": False}
+        # тело уже отдано: дальше клиент «висит» до конца ответа, как настоящее соединение
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+async def run_scenario(scenario: Scenario, samples: Samples, requests: int, concurrency: int, seed: int,
+                       counter: QueryCounter) -> Dict[str, float]:
+    rng = random.Random(seed)
+    for _ in range(WARMUP_REQUESTS):
+        await call(scenario.make_request(rng, samples))
+
+    planned = [scenario.make_request(rng, samples) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for request in planned:
+        queue.put_nowait(request)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            request = queue.get_nowait()
+            started = time.perf_counter()
+            status = await call(request)
+            latencies.append(time.perf_counter() - started)
+            errors += not (200 <= status < 300 or status == 304)
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "queries_per_request": (counter.count - queries_before) / requests,
+        "errors": errors,
+        # ru_maxrss в Linux — в килобайтах; пик за весь процесс, поэтому растёт от сценария к сценарию
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> \
+        List[str]:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['rps']:.0f} -> {current['rps']:.0f} req/s")
+        if current["queries_per_request"] > previous["queries_per_request"] + 0.01:
+            regressions.append(
+                f"{name}: queries/request {previous['queries_per_request']:.2f} -> "
+                f"{current['queries_per_request']:.2f}"
+            )
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_table(baseline_key: str, results: Dict[str, Dict[str, float]]) -> None:
+    print(f"organizations: {baseline_key}")
+    print(f"{'scenario':>16} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'req/s':>9} {'queries':>8} "
+          f"{'errors':>7} {'RSS, MB':>8}")
+    for name, metrics in results.items():
+        print(f"{name:>16} {metrics['p50_ms']:>9.2f} {metrics['p95_ms']:>9.2f} {metrics['p99_ms']:>9.2f} "
+              f"{metrics['rps']:>9.0f} {metrics['queries_per_request']:>8.2f} {metrics['errors']:>7} "
+              f"{metrics['peak_rss_mb']:>8.0f}")
+
+
+async def run(args) -> int:
+    # SQL-эхо движка приложения искажает замер
+    engine.echo = False
+    http_cache.HTTP_CACHE_ENABLED = args.http_cache
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+    counter = QueryCounter()
+    selected = [scenario for scenario in SCENARIOS if not args.only or scenario.name in args.only]
+    async with app.router.lifespan_context(app):
+        scale = await count_rows()
+        baseline_key = f"{scale}:http-cache" if args.http_cache else str(scale)
+        samples = await load_samples(random.Random(args.seed))
+        results = {}
+        for scenario in selected:
+            results[scenario.name] = await run_scenario(
+                scenario, samples, args.requests, args.concurrency, args.seed, counter
+            )
+    await engine.dispose()
+
+    print_table(baseline_key, results)
+
+    if args.save_baseline:
+        try:
+            with open(args.save_baseline, encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            stored = {}
+        stored[baseline_key] = results
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get(baseline_key)
+        if baseline is None:
+            print(f"no baseline for {baseline_key} in {args.baseline}")
+            return 0
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"[REGRESSION] {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Endpoint latency/throughput benchmark")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", choices=[scenario.name for scenario in SCENARIOS])
+    parser.add_argument("--save-baseline", help="store results in this JSON file (keyed by dataset size)")
+    parser.add_argument("--baseline", help="compare with this JSON file, exit code 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--http-cache", action="store_true", help="keep the ETag/LRU response cache enabled")
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
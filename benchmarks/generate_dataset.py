@@ -0,0 +1,167 @@
+# Синтетический справочник для нагрузочных проверок: детерминированный при одном и том же --seed.
+# Здания скапливаются вокруг центров городов (нормальное распределение от центра), дерево деятельностей
+# задаётся шириной и глубиной, у организаций по несколько телефонов и деятельностей.
+# Записи пишутся в БД через массовый импорт (app.bulk_import) или в NDJSON-файл для него же.
+# Запуск: python -m benchmarks.generate_dataset --organizations 1000000 --buildings 200000 [--output data.ndjson]
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import sys
+from bisect import bisect_right
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.bulk_import import PATH_SEPARATOR, ImportRecord, format_stats, run_import
+from app.core.constants import BULK_IMPORT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE = 111.32
+
+
+class City(NamedTuple):
+    name: str
+    latitude: float
+    longitude: float
+    # разброс зданий от центра, км
+    spread_km: float
+    # доля зданий города
+    weight: float
+
+
+CITIES = (
+    City("Москва", 55.7558, 37.6173, 12.0, 0.40),
+    City("Санкт-Петербург", 59.9386, 30.3141, 9.0, 0.20),
+    City("Новосибирск", 55.0084, 82.9357, 7.0, 0.10),
+    City("Екатеринбург", 56.8389, 60.6057, 6.0, 0.08),
+    City("Казань", 55.7963, 49.1088, 5.0, 0.07),
+    City("Таллин", 59.4370, 24.7536, 4.0, 0.06),
+    City("Тарту", 58.3780, 26.7290, 2.5, 0.05),
+    City("Нарва", 59.3772, 28.1903, 2.0, 0.04),
+)
+
+STREETS = ("Ленина", "Мира", "Садовая", "Центральная", "Школьная", "Лесная", "Советская", "Набережная",
+           "Пушкина", "Гагарина", "Полевая", "Заводская", "Блюхера", "Речная", "Нарвское шоссе")
+NAME_PREFIXES = ("ООО", "АО", "ИП", "ЗАО", "ПАО")
+NAME_WORDS = ("Рога", "Копыта", "Молочная", "Ферма", "Авто", "Мир", "Север", "Восток", "Техно", "Строй", "Маркет",
+              "Сервис", "Логистик", "Пекарня", "Торг", "Групп", "Альфа", "Вектор", "Гранит", "Лидер")
+
+
+def _cumulative_weights(cities: Sequence[City]) -> List[float]:
+    total = 0.0
+    weights = []
+    for city in cities:
+        total += city.weight
+        weights.append(total)
+    return weights
+
+
+def activity_paths(breadth: int, depth: int) -> List[Tuple[str, ...]]:
+    # все узлы дерева: breadth корней и по breadth детей у каждого узла выше depth
+    paths: List[Tuple[str, ...]] = []
+    level: List[Tuple[Tuple[str, ...], Tuple[int, ...]]] = [((), ())]
+    for _ in range(depth):
+        level = [
+            (names + (f"Деятельность {'.'.join(map(str, numbers + (index,)))}",), numbers + (index,))
+            for names, numbers in level
+            for index in range(1, breadth + 1)
+        ]
+        paths.extend(names for names, _ in level)
+    return paths
+
+
+class DatasetGenerator:
+    def __init__(self, organizations: int, buildings: int, breadth: int, depth: int, max_phones: int,
+                 max_activities: int, seed: int):
+        self.organizations = organizations
+        self.buildings = buildings
+        self.max_phones = max_phones
+        self.max_activities = max_activities
+        self.seed = seed
+        self.activity_paths = activity_paths(breadth, depth)
+        self._city_weights = _cumulative_weights(CITIES)
+
+    def building(self, building_index: int) -> Tuple[str, float, float]:
+        # здание зависит только от seed и номера: организации одного здания получают одинаковый адрес,
+        # а все здания не нужно держать в памяти
+        rng = random.Random(self.seed * 1_000_003 + building_index)
+        city = CITIES[min(bisect_right(self._city_weights, rng.random() * self._city_weights[-1]), len(CITIES) - 1)]
+        distance_km = abs(rng.gauss(0.0, city.spread_km))
+        bearing = rng.uniform(0.0, 2 * math.pi)
+        latitude = city.latitude + distance_km * math.cos(bearing) / KM_PER_DEGREE
+        longitude = city.longitude + distance_km * math.sin(bearing) / (
+            KM_PER_DEGREE * math.cos(math.radians(city.latitude))
+        )
+        # номер здания в адресе делает адрес уникальным: импорт сопоставляет здания по адресу
+        address = f"г. {city.name}, ул. {rng.choice(STREETS)}, {rng.randint(1, 200)}, стр. {building_index + 1}"
+        return address, round(latitude, 6), round(longitude, 6)
+
+    def records(self) -> Iterator[ImportRecord]:
+        rng = random.Random(self.seed)
+        for organization_index in range(self.organizations):
+            # часть зданий — бизнес-центры с множеством организаций
+            building_index = int(self.buildings * rng.random() ** 1.5)
+            address, latitude, longitude = self.building(building_index)
+            name = (
+                f'{rng.choice(NAME_PREFIXES)} "{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)}" '
+                f'№{organization_index + 1}'
+            )
+            phones = tuple(
+                f"+7-9{rng.randint(10, 99)}-{rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}"
+                for _ in range(rng.randint(1, self.max_phones))
+            )
+            activities = tuple(sorted(set(
+                rng.choice(self.activity_paths) for _ in range(rng.randint(1, self.max_activities))
+            ))) if self.activity_paths else ()
+            yield ImportRecord(name, address, latitude, longitude, phones, activities)
+
+
+def write_ndjson(records: Iterator[ImportRecord], path: str) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as output:
+        for record in records:
+            output.write(json.dumps({
+                "name": record.name,
+                "address": record.address,
+                "latitude": record.latitude,
+                "longitude": record.longitude,
+                "phones": list(record.phones),
+                "activities": [PATH_SEPARATOR.join(path) for path in record.activities],
+            }, ensure_ascii=False))
+            output.write("\n")
+            count += 1
+    return count
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Deterministic synthetic dataset for load testing")
+    parser.add_argument("--organizations", type=int, default=1_000_000)
+    parser.add_argument("--buildings", type=int, default=200_000)
+    parser.add_argument("--breadth", type=int, default=8, help="children per activity type")
+    parser.add_argument("--depth", type=int, default=3, help="levels of the activity taxonomy")
+    parser.add_argument("--phones", type=int, default=3, help="max phones per organization")
+    parser.add_argument("--activities", type=int, default=3, help="max activity types per organization")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write NDJSON for app.bulk_import instead of loading into the database")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.organizations < 0 or args.buildings < 1 or args.phones < 1 or args.activities < 1:
+        parser.error("--buildings, --phones and --activities must be positive, --organizations non-negative")
+
+    generator = DatasetGenerator(
+        args.organizations, args.buildings, args.breadth, args.depth, args.phones, args.activities, args.seed
+    )
+    if args.output:
+        logger.info("Written %d organizations to %s", write_ndjson(generator.records(), args.output), args.output)
+    else:
+        stats = asyncio.run(run_import(generator.records(), args.batch_size))
+        logger.info("Dataset loaded: %s", format_stats(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
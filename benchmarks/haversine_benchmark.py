@@ -0,0 +1,51 @@
+# Сравнение построчного и векторного фильтра по радиусу.
+# Запуск: python -m benchmarks.haversine_benchmark
+import random
+import time
+
+from app.core import geo
+
+SIZES = (1_000, 100_000, 1_000_000)
+CENTER_LAT, CENTER_LON = 59.437, 24.753
+RADIUS_KM = 5.0
+
+
+def scalar_filter(ids, lats, lons):
+    boxes = geo.radius_bboxes(CENTER_LAT, CENTER_LON, RADIUS_KM)
+    return [
+        point_id
+        for point_id, lat, lon in zip(ids, lats, lons)
+        if any(lat_lo <= lat <= lat_hi and lon_lo <= lon <= lon_hi for lat_lo, lon_lo, lat_hi, lon_hi in boxes)
+        and geo.haversine_km(CENTER_LON, CENTER_LAT, lon, lat) <= RADIUS_KM
+    ]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    if geo.np is None:
+        print("numpy is not installed: only the pure-Python path is available")
+
+    rng = random.Random(42)
+    print(f"{'candidates':>12} {'scalar, ms':>12} {'vectorized, ms':>15} {'speed-up':>9}")
+    for size in SIZES:
+        ids = list(range(size))
+        lats = [CENTER_LAT + rng.uniform(-0.05, 0.05) for _ in ids]
+        lons = [CENTER_LON + rng.uniform(-0.1, 0.1) for _ in ids]
+
+        scalar_time, expected = timed(scalar_filter, ids, lats, lons)
+        if geo.np is not None:
+            ids, lats, lons = geo.np.asarray(ids), geo.np.asarray(lats), geo.np.asarray(lons)
+        vector_time, actual = timed(geo.filter_within_radius, CENTER_LAT, CENTER_LON, RADIUS_KM, ids, lats, lons)
+        assert sorted(actual) == sorted(expected)
+
+        print(f"{size:>12} {scalar_time * 1000:>12.1f} {vector_time * 1000:>15.1f} "
+              f"{scalar_time / vector_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Проверка планов горячих запросов на большом наборе данных.
+# Нужна локальная Postgres с применёнными миграциями (alembic upgrade head).
+# Данные заливаются внутри транзакции и откатываются по завершении.
+# Запуск: python -m benchmarks.query_plans [количество зданий] [количество организаций]
+import asyncio
+import sys
+from typing import Callable, List, NamedTuple, Tuple
+
+from sqlalchemy import Integer, Select, any_, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app.models.activity_type import ActivityType
+from app.models.organization import Organization
+from app.repositories.activities_repository import ActivitiesRepository
+from app.repositories.organizations_repository import OrganizationsRepository
+from app.utils.db import DATABASE_URL
+
+DEFAULT_BUILDINGS = 1_000_000
+DEFAULT_ORGANIZATIONS = 1_000_000
+# дерево деятельностей: корни, их дети, внуки
+ACTIVITY_LEVELS = (100, 1_000, 8_900)
+PHONES_PER_ORGANIZATION = 2
+ACTIVITIES_PER_ORGANIZATION = 2
+
+
+class PlanCheck(NamedTuple):
+    title: str
+    stmt: Callable[[], Select]
+    # все индексы должны встретиться в плане
+    expected_indexes: Tuple[str, ...]
+
+
+def fulltext_select(query: str) -> Select:
+    match, rank = OrganizationsRepository.fulltext_match(query)
+    return select(Organization.organization_id, rank).where(match)
+
+
+def int_array(name: str, values: List[int]):
+    return bindparam(name, values, type_=ARRAY(Integer))
+
+
+def projections_select(organization_ids: List[int]) -> Select:
+    return OrganizationsRepository.projection_select().where(
+        Organization.organization_id == any_(int_array("organization_ids", organization_ids))
+    )
+
+
+# id деятельностей неизвестны заранее: берём последний лист засеянного дерева
+def leaf_activity_id():
+    return select(func.max(ActivityType.activity_type_id)).scalar_subquery()
+
+
+CHECKS: List[PlanCheck] = [
+    PlanCheck(
+        "buildings bbox prefilter",
+        lambda: OrganizationsRepository.buildings_in_bboxes_select([(59.40, 24.70, 59.42, 24.73)]),
+        ("ix_buildings_point",),
+    ),
+    PlanCheck(
+        "organizations name search",
+        lambda: (
+            select(Organization.organization_id, func.similarity(Organization.name, "молоч"))
+            .where(Organization.name.ilike("%молоч%"))
+        ),
+        ("ix_organizations_name_trgm",),
+    ),
+    PlanCheck(
+        "organizations full-text search",
+        lambda: fulltext_select("молочная Таллин"),
+        ("ix_organizations_search_document",),
+    ),
+    PlanCheck(
+        "organizations in building",
+        lambda: OrganizationsRepository.ids_in_building_select(1),
+        ("ix_organizations_building_id",),
+    ),
+    PlanCheck(
+        "organizations in buildings page",
+        lambda: OrganizationsRepository.ids_by_building_ids_select(list(range(1, 51)), limit=100),
+        ("ix_organizations_building_id",),
+    ),
+    PlanCheck(
+        "organization projections",
+        lambda: projections_select(list(range(1, 101))),
+        ("organizations_pkey", "ix_phones_organization_id", "organization_activity_pkey"),
+    ),
+    PlanCheck(
+        "organizations in activity subtree",
+        lambda: ActivitiesRepository.organization_ids_in_subtree_select(leaf_activity_id()),
+        ("ix_activity_type_closure_ancestor_depth", "ix_organization_activity_activity_type_id"),
+    ),
+    PlanCheck(
+        "activity type children",
+        lambda: select(ActivityType.activity_type_id).where(ActivityType.parent_id == 1),
+        ("ix_activity_types_parent_id",),
+    ),
+]
+
+
+async def seed(conn: AsyncConnection, buildings: int, organizations: int) -> None:
+    await conn.execute(
+        text("""
+            INSERT INTO buildings (address, latitude, longitude)
+            SELECT 'Building ' || g, 59.3 + random() * 0.3, 24.5 + random() * 0.5
+            FROM generate_series(1, :buildings) AS g
+        """),
+        {"buildings": buildings},
+    )
+    await conn.execute(
+        text("""
+            INSERT INTO organizations (name, building_id)
+            SELECT 'Организация ' || md5(g::text) || ' ' || g,
+                   (SELECT min(building_id) FROM buildings) + g % :buildings
+            FROM generate_series(1, :organizations) AS g
+        """),
+        {"buildings": buildings, "organizations": organizations},
+    )
+
+    # уровень за уровнем: триггер замыкания должен видеть строки родителей
+    parent_ids: List[int] = []
+    for count in ACTIVITY_LEVELS:
+        res = await conn.execute(
+            text("""
+                INSERT INTO activity_types (name, parent_id)
+                SELECT 'Деятельность ' || md5(random()::text),
+                       CASE WHEN cardinality(CAST(:parents AS integer[])) = 0 THEN NULL
+                            ELSE (CAST(:parents AS integer[]))[1 + g % cardinality(CAST(:parents AS integer[]))]
+                       END
+                FROM generate_series(1, :count) AS g
+                RETURNING activity_type_id
+            """),
+            {"parents": parent_ids, "count": count},
+        )
+        parent_ids = list(res.scalars().all())
+
+    await conn.execute(
+        text("""
+            INSERT INTO phones (number, organization_id)
+            SELECT '8-900-' || lpad((organization_id * 10 + g)::text, 10, '0'), organization_id
+            FROM organizations, generate_series(1, :per_organization) AS g
+        """),
+        {"per_organization": PHONES_PER_ORGANIZATION},
+    )
+    await conn.execute(
+        text("""
+            INSERT INTO organization_activity (organization_id, activity_type_id)
+            SELECT organization_id, (CAST(:leaves AS integer[]))[1 + (organization_id * g * 7919) % cardinality(
+                CAST(:leaves AS integer[])
+            )]
+            FROM organizations, generate_series(1, :per_organization) AS g
+            ON CONFLICT DO NOTHING
+        """),
+        {"leaves": parent_ids, "per_organization": ACTIVITIES_PER_ORGANIZATION},
+    )
+
+    for table in ("buildings", "organizations", "phones", "activity_types", "activity_type_closure",
+                  "organization_activity"):
+        await conn.execute(text(f"ANALYZE {table}"))
+
+
+async def explain(conn: AsyncConnection, stmt: Select) -> str:
+    # без literal_binds: у части параметров (например, REGCONFIG) нет литерального представления
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    res = await conn.exec_driver_sql(f"EXPLAIN {compiled}", params)
+    return "\n".join(row[0] for row in res.fetchall())
+
+
+async def main(buildings: int, organizations: int) -> int:
+    engine = create_async_engine(DATABASE_URL)
+    failures = 0
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await seed(conn, buildings, organizations)
+            for check in CHECKS:
+                plan = await explain(conn, check.stmt())
+                ok = all(index in plan for index in check.expected_indexes) and "Seq Scan" not in plan
+                failures += not ok
+                print(f"[{'OK' if ok else 'FAIL'}] {check.title}")
+                if not ok:
+                    print(plan)
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+    return failures
+
+
+if __name__ == "__main__":
+    buildings_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUILDINGS
+    organizations_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ORGANIZATIONS
+    sys.exit(1 if asyncio.run(main(buildings_count, organizations_count)) else 0)
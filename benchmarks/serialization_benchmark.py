@@ -0,0 +1,75 @@
+# Стоимость сериализации списка организаций: прежний путь через pydantic и response_model против прямой выдачи байтов.
+# Запуск: python -m benchmarks.serialization_benchmark
+import json
+import random
+import time
+from typing import Dict, List
+
+from pydantic import TypeAdapter
+
+from app.models.schemas.organization import OrganizationRead
+from app.utils import serialization
+
+SIZES = (100, 1_000, 10_000)
+REPEATS = 5
+
+
+def make_document(rng: random.Random, organization_id: int) -> Dict:
+    leaf = {"activity_type_id": 3, "name": "Молочная продукция", "parent_id": 2, "children": []}
+    middle = {"activity_type_id": 2, "name": "Мясная продукция", "parent_id": 1, "children": [leaf]}
+    return {
+        "organization_id": organization_id,
+        "name": f'ООО "Организация {organization_id}"',
+        "building": {
+            "building_id": organization_id % 1000,
+            "address": f"г. Москва, ул. Ленина {organization_id % 300}, офис {organization_id % 50}",
+            "latitude": 55.7 + rng.random() / 10,
+            "longitude": 37.6 + rng.random() / 10,
+        },
+        "phones": [
+            {"phone_id": organization_id * 3 + i, "number": f"8-923-{rng.randint(100, 999)}-{rng.randint(10, 99)}"}
+            for i in range(3)
+        ],
+        "activities": [{"activity_type_id": 1, "name": "Еда", "parent_id": None, "children": [middle]}],
+    }
+
+
+# как было: OrganizationRead(**dict) в сервисе, затем валидация и сериализация по response_model и json.dumps
+def pydantic_path(documents: List[Dict], adapter: TypeAdapter) -> bytes:
+    models = [OrganizationRead(**document) for document in documents]
+    validated = adapter.validate_python(models)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(documents: List[Dict]) -> bytes:
+    return serialization.dumps(documents)
+
+
+def best_of(fn, *args) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    if serialization.orjson is None:
+        print("orjson is not installed: the fast path falls back to the standard json module")
+
+    rng = random.Random(42)
+    adapter = TypeAdapter(List[OrganizationRead])
+    print(f"{'organizations':>14} {'pydantic, us/org':>17} {'fast, us/org':>13} {'speed-up':>9}")
+    for size in SIZES:
+        documents = [make_document(rng, organization_id) for organization_id in range(1, size + 1)]
+        assert json.loads(pydantic_path(documents, adapter)) == json.loads(fast_path(documents))
+
+        slow = best_of(pydantic_path, documents, adapter)
+        fast = best_of(fast_path, documents)
+        print(f"{size:>14} {slow / size * 1e6:>17.2f} {fast / size * 1e6:>13.2f} {slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()